@@ -13,12 +13,101 @@ class Settings(BaseSettings):
     # Model Settings
     MODEL_NAME: str = "microsoft/DialoGPT-medium"
     EMBEDDING_MODEL: str = "sentence-transformers/all-MiniLM-L6-v2"
+    EMBEDDING_BACKEND: str = "torch"  # torch, torch_int8 or onnx
+    EMBEDDING_ONNX_DIR: str = "data/onnx"
+    EMBEDDING_MIN_AGREEMENT: float = 0.9  # top-k recall vs fp32 required for other backends; 0 skips the check
+    EMBEDDING_AGREEMENT_TOP_K: int = 3
     MAX_RESPONSE_LENGTH: int = 512
     TEMPERATURE: float = 0.7
+    GENERATION_MAX_NEW_TOKENS: int = 100
+    STREAM_FILTER_WORDS: int = 16  # words checked by the medical filter before streaming starts
+    STREAM_TIMEOUT_SECONDS: float = 60.0
+    
+    # Conversation Context Settings
+    CONTEXT_TOKEN_BUDGET: int = 256  # tokens of earlier turns fed to DialoGPT
+    CONTEXT_MAX_MESSAGES: int = 10  # recent messages considered for the context
+    CONTEXT_CACHE_SESSIONS: int = 1000  # sessions whose turn token IDs are cached per process
+    
+    # CPU Inference Settings
+    GENERATION_QUANTIZE_INT8: bool = False  # dynamic int8 copy of DialoGPT
+    GENERATION_REUSE_PREFIX_CACHE: bool = True  # keep the medical context's past key/values
+    TORCH_INTRA_OP_THREADS: int = 0  # 0 keeps torch's default
+    TORCH_INTER_OP_THREADS: int = 0
+    
+    # Generation Batching Settings
+    GENERATION_BATCHING_ENABLED: bool = False
+    GENERATION_BATCH_MAX_SIZE: int = 8
+    GENERATION_BATCH_WAIT_MS: float = 20.0
+    GENERATION_BATCH_DEADLINE_SLACK: float = 1.5  # requests share a batch while deadlines are within this factor
+    
+    # Latency Budget Settings
+    LATENCY_BUDGET_MS: float = 5000  # per chat turn; 0 disables the budget
+    MIN_GENERATION_MS: float = 250  # below this much budget, skip generation entirely
+    BUDGET_FALLBACK_MIN_SIMILARITY: float = 0.2
+    
+    # Knowledge Base Settings
+    KNOWLEDGE_PATH: str = ""  # JSON knowledge file; empty uses the bundled ABDOMINAL_PAIN_KNOWLEDGE
+    KNOWLEDGE_WATCH_INTERVAL_SECONDS: float = 0  # poll the file for changes; 0 disables the watcher
+    ADMIN_TOKEN: str = ""  # required in X-Admin-Token; admin endpoints are disabled while empty
+    
+    # Batch Chat Settings
+    BATCH_CHUNK_SIZE: int = 64  # messages analyzed and retrieved together
+    BATCH_MAX_ITEMS: int = 1000  # per non-streamed /chat/batch request
+    
+    # Admission Control Settings
+    ADMISSION_ENABLED: bool = True
+    ADMISSION_URGENT_CONCURRENCY: int = 4  # turns matching a warning sign
+    ADMISSION_URGENT_QUEUE: int = 64
+    ADMISSION_MEDICAL_CONCURRENCY: int = 8  # knowledge-base lookups
+    ADMISSION_MEDICAL_QUEUE: int = 32
+    ADMISSION_GENERATIVE_CONCURRENCY: int = 2  # DialoGPT fallback
+    ADMISSION_GENERATIVE_QUEUE: int = 8
+    ADMISSION_QUEUE_TIMEOUT_SECONDS: float = 10.0  # longest queue wait before shedding; 0 waits indefinitely
     
     # Vector Database Settings
     VECTOR_DB_PATH: str = "data/vector_db"
     EMBEDDING_DIMENSION: int = 384
+    RETRIEVER_BACKEND: str = "exact"  # brute_force, exact or faiss
+    FAISS_INDEX_TYPE: str = "hnsw"  # hnsw or ivf
+    FAISS_HNSW_M: int = 32
+    FAISS_EF_SEARCH: int = 64
+    FAISS_NLIST: int = 100
+    FAISS_NPROBE: int = 8
+    
+    # Lexical Retrieval Cascade Settings
+    LEXICAL_CASCADE_ENABLED: bool = True
+    LEXICAL_MIN_SCORE: float = 1.0  # BM25 score the top hit needs to skip the embedder
+    LEXICAL_CONFIDENCE_MARGIN: float = 0.5  # relative lead over the runner-up
+    LEXICAL_MIN_COVERAGE: float = 0.6  # share of query terms the top hit must contain
+    LEXICAL_FUSION_WEIGHT: float = 0.1
+    
+    # Embedding Batching Settings
+    EMBEDDING_BATCHING_ENABLED: bool = False
+    EMBEDDING_BATCH_MAX_SIZE: int = 32
+    EMBEDDING_BATCH_WAIT_MS: float = 5.0
+    
+    # Startup Settings
+    LAZY_MODEL_LOADING: bool = True  # bind the port first and load models in the background
+    WARMUP_CONVERSATIONAL: bool = True  # otherwise DialoGPT loads on the first fallback
+    
+    # Inference Execution Settings
+    INFERENCE_MODE: str = "thread"  # thread or process
+    INFERENCE_WORKERS: int = 4
+    INFERENCE_MAX_IN_FLIGHT: int = 8
+    
+    # Session Settings
+    SESSION_BACKEND: str = "memory"  # memory or sqlite (shared across workers)
+    SESSION_DB_PATH: str = "data/sessions.db"
+    SESSION_TTL_SECONDS: float = 3600
+    SESSION_MAX_SESSIONS: int = 10000
+    SESSION_MAX_MESSAGES: int = 100
+    HISTORY_PAGE_SIZE: int = 100  # default /history page, and the chunk size of streamed exports
+    HISTORY_MAX_PAGE_SIZE: int = 1000
+    
+    # Cache Settings (a size of 0 disables the cache)
+    RESPONSE_CACHE_SIZE: int = 1024
+    RESPONSE_CACHE_TTL_SECONDS: float = 3600
+    EMBEDDING_CACHE_SIZE: int = 4096
     
     # Medical Knowledge Settings
     CONFIDENCE_THRESHOLD: float = 0.75
@@ -79,5 +79,21 @@ ABDOMINAL_PAIN_KNOWLEDGE = {
         "what_can_you_do": [
             "what can you do", "how can you help", "what do you know"
         ]
+    },
+    
+    # Words that mark generated text as on-topic
+    "medical_keywords": [
+        "pain", "painful", "symptom", "symptoms", "condition", "conditions", "doctor", "doctors",
+        "medical", "treatment", "treatments", "abdomen", "abdominal", "stomach", "digestive",
+        "digestion", "nausea", "fever", "diagnosis"
+    ],
+    
+    # Symptom keywords that drive follow-up suggestions, with the word forms that match them
+    "symptom_keywords": {
+        "pain": ["pain", "pains", "painful"],
+        "hurt": ["hurt", "hurts", "hurting"],
+        "ache": ["ache", "aches", "aching", "stomachache", "bellyache"],
+        "nausea": ["nausea", "nauseous", "nauseated"],
+        "fever": ["fever", "fevers", "feverish"]
     }
 }
\ No newline at end of file
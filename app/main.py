@@ -1,10 +1,23 @@
-from fastapi import FastAPI, HTTPException
+import time
+
+# Measured from before the heavy imports to the first request served
+_IMPORT_STARTED = time.perf_counter()
+
+from fastapi import FastAPI, Header, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Any, Dict, Optional, List
+import asyncio
+import hmac
+import json
 import uvicorn
 
+from config import settings
+from services.admission import AdmissionRejected
 from services.chat_service import ChatService
+from utils.metrics import registry as metrics_registry
 
 app = FastAPI(
     title="Medical Chatbot API",
@@ -21,49 +34,235 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize chat service
-chat_service = ChatService()
+# Initialize chat service; in lazy mode models load after the port is bound
+chat_service = ChatService(load_models=not settings.LAZY_MODEL_LOADING)
+
+startup_timings = {
+    "import_seconds": time.perf_counter() - _IMPORT_STARTED,
+    "ready_seconds": None,
+    "first_request_seconds": None
+}
+
+def _ensure_ready():
+    """Reject chat traffic until the embedder and knowledge index are loaded"""
+    model = chat_service.chatbot_model
+    if model.is_ready:
+        return
+    # A failed load is not retried, so a Retry-After would only keep clients polling
+    if model.model_state["embedder"] == "failed":
+        raise HTTPException(status_code=503, detail="Embedding model failed to load")
+    raise HTTPException(status_code=503, detail="Models are still loading", headers={"Retry-After": "5"})
+
+@app.middleware("http")
+async def record_first_request(request: Request, call_next):
+    if startup_timings["first_request_seconds"] is None:
+        startup_timings["first_request_seconds"] = time.perf_counter() - _IMPORT_STARTED
+        print(f"First request {startup_timings['first_request_seconds']:.2f}s after import")
+    return await call_next(request)
 
 # Request/Response models
 class ChatRequest(BaseModel):
     message: str
     session_id: Optional[str] = None
+    latency_budget_ms: Optional[float] = None  # overrides settings.LATENCY_BUDGET_MS
+    include_timings: bool = False  # adds a per-stage timing breakdown to the response metadata
 
 class ChatResponse(BaseModel):
     session_id: str
     response: str
     suggestions: List[str]
     timestamp: str
+    metadata: Dict[str, Any] = {}
+
+class BatchChatItem(BaseModel):
+    message: str
+    session_id: Optional[str] = None
+
+class BatchChatRequest(BaseModel):
+    items: List[BatchChatItem]
+    stream: bool = False  # NDJSON, one result per line, for inputs too large to buffer
+    latency_budget_ms: Optional[float] = None
+
+class BatchChatResponse(BaseModel):
+    results: List[ChatResponse]
 
 # API Routes
 @app.post("/chat", response_model=ChatResponse)
 async def chat_endpoint(request: ChatRequest):
     """Main chat endpoint"""
+    _ensure_ready()
     try:
-        result = chat_service.process_message(
-            session_id=request.session_id or chat_service.create_session(),
-            message=request.message
+        result = await chat_service.process_message_async(
+            session_id=request.session_id or await chat_service.call_session_store(chat_service.create_session),
+            message=request.message,
+            latency_budget_ms=request.latency_budget_ms,
+            include_timings=request.include_timings
         )
         return ChatResponse(**result)
+    except AdmissionRejected as e:
+        # Shed load fast rather than queueing past the client's timeout
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/chat/stream")
+async def chat_stream_endpoint(request: ChatRequest):
+    """Stream the chat response as server-sent events"""
+    _ensure_ready()
+    events = chat_service.stream_message(
+        session_id=request.session_id or await chat_service.call_session_store(chat_service.create_session),
+        message=request.message,
+        include_timings=request.include_timings
+    )
+    
+    def event_stream():
+        for event in events:
+            yield f"data: {json.dumps(event)}\n\n"
+    
+    # Sync generators run in the threadpool, keeping generation off the event loop
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/chat/batch", response_model=BatchChatResponse)
+async def chat_batch_endpoint(request: BatchChatRequest):
+    """Answer many messages in one call, in input order"""
+    _ensure_ready()
+    items = [(item.session_id, item.message) for item in request.items]
+    
+    if request.stream:
+        def ndjson_stream():
+            for result in chat_service.iter_batch(items, request.latency_budget_ms):
+                yield json.dumps(result) + "\n"
+        
+        return StreamingResponse(ndjson_stream(), media_type="application/x-ndjson")
+    
+    if len(items) > settings.BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {settings.BATCH_MAX_ITEMS} items per batch; set stream=true for larger inputs"
+        )
+    try:
+        results = await run_in_threadpool(chat_service.process_batch, items, request.latency_budget_ms)
+        return BatchChatResponse(results=[ChatResponse(**result) for result in results])
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/admin/knowledge/reload")
+async def reload_knowledge(x_admin_token: Optional[str] = Header(None)):
+    """Re-read the knowledge file, re-embedding only changed conditions"""
+    # Admin endpoints stay disabled until a token is configured
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not hmac.compare_digest((x_admin_token or "").encode("utf-8"), settings.ADMIN_TOKEN.encode("utf-8")):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+    try:
+        result = await run_in_threadpool(chat_service.chatbot_model.reload_knowledge)
+    except (OSError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Knowledge reload failed: {e}")
+    return result
+
+@app.on_event("startup")
+async def watch_knowledge():
+    """Poll the knowledge file and hot-reload it when it changes"""
+    if not settings.KNOWLEDGE_PATH or settings.KNOWLEDGE_WATCH_INTERVAL_SECONDS <= 0:
+        return
+    
+    async def watch():
+        while True:
+            await asyncio.sleep(settings.KNOWLEDGE_WATCH_INTERVAL_SECONDS)
+            await run_in_threadpool(chat_service.chatbot_model.reload_if_changed)
+    
+    app.state.knowledge_watcher = asyncio.create_task(watch())
+
+@app.on_event("startup")
+async def warm_up():
+    """Load models in the background so the server accepts connections immediately"""
+    async def load():
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, chat_service.warm_up)
+        startup_timings["ready_seconds"] = time.perf_counter() - _IMPORT_STARTED
+        print(f"Models ready {startup_timings['ready_seconds']:.2f}s after import")
+    
+    if settings.LAZY_MODEL_LOADING:
+        app.state.warmup_task = asyncio.create_task(load())
+    else:
+        startup_timings["ready_seconds"] = time.perf_counter() - _IMPORT_STARTED
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Stop inference workers"""
+    chat_service.shutdown()
+
 @app.post("/session")
 async def create_session():
     """Create new chat session"""
-    session_id = chat_service.create_session()
+    session_id = await chat_service.call_session_store(chat_service.create_session)
     return {"session_id": session_id}
 
 @app.get("/session/{session_id}/history")
-async def get_history(session_id: str):
-    """Get chat history"""
-    history = chat_service.get_session_history(session_id)
-    return {"history": history}
+async def get_history(session_id: str, since: int = Query(0, ge=0),
+                      limit: Optional[int] = Query(None, ge=1, le=settings.HISTORY_MAX_PAGE_SIZE),
+                      stream: bool = False):
+    """Get chat history after the `since` cursor; pass the returned next_since to poll for new turns"""
+    if stream:
+        def ndjson_stream():
+            for record in chat_service.iter_history(session_id, since):
+                yield record + "\n"
+        
+        return StreamingResponse(ndjson_stream(), media_type="application/x-ndjson")
+    
+    # Messages are serialized when stored; only the page envelope is encoded here
+    records, next_since, has_more = await chat_service.call_session_store(
+        chat_service.get_history_page, session_id, since, limit
+    )
+    body = '{"history":[%s],"next_since":%d,"has_more":%s}' % (
+        ",".join(records), next_since, "true" if has_more else "false"
+    )
+    return Response(content=body, media_type="application/json")
+
+@app.get("/stats")
+async def get_stats():
+    """Runtime statistics such as embedding batch sizes and queue depth"""
+    stats = await chat_service.call_session_store(chat_service.get_stats)
+    stats["startup"] = startup_timings
+    return stats
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Per-stage latency histograms and response path counters in Prometheus text format"""
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
 
 @app.get("/health")
+@app.get("/health/live")
 async def health_check():
-    """Health check endpoint"""
-    return {"status": "healthy", "service": "medical-chatbot"}
+    """Liveness check: the process is up and serving requests"""
+    return {
+        "status": "healthy",
+        "service": "medical-chatbot",
+        "models": chat_service.chatbot_model.model_state
+    }
+
+@app.get("/health/ready")
+async def readiness_check():
+    """Readiness check: medical retrieval is available"""
+    ready = chat_service.chatbot_model.is_ready
+    if ready:
+        status = "ready"
+    elif chat_service.chatbot_model.model_state["embedder"] == "failed":
+        status = "failed"
+    else:
+        status = "loading"
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "status": status,
+            "models": chat_service.chatbot_model.model_state,
+            "startup": startup_timings
+        }
+    )
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -1,18 +1,54 @@
-import torch
-import torch.nn as nn
-from transformers import (
-    AutoTokenizer, AutoModelForCausalLM, 
-    Trainer, TrainingArguments, 
-    GPT2LMHeadModel, GPT2Tokenizer
-)
-from sentence_transformers import SentenceTransformer
+# torch, transformers and sentence_transformers are imported where the models
+# are loaded or run, so importing this module stays cheap for API startup
 import numpy as np
-from typing import List, Tuple, Dict
-import pickle
-import json
+from typing import List, Tuple, Dict, Optional, Set, Iterator
+import threading
+import time
 
+from config import settings
+from models.conversation_context import ConversationTokenCache
+from models.embedding_backends import create_embedder, topk_agreement
+from models.embedding_index import EmbeddingIndexStore
+from models.generation_engine import CPUGenerationEngine, configure_torch_threads, group_by_deadline
+from models.knowledge_base import KnowledgeSnapshot, knowledge_mtime, load_knowledge
+from models.lexical_index import BM25Index
+from models.retrievers import create_retriever
+from utils.batching import MicroBatcher
+from utils.cache import LRUCache
+from utils.response_formatter import NO_MATCH_RESPONSE, compile_condition
+from utils.text_processor import normalize_text
+from utils.timing import LatencyBudget, StageTimer
+
+MEDICAL_CONTEXT = "You are a medical assistant specialized in abdominal pain. "
+NOT_TRAINED_RESPONSE = "I'm not trained to answer questions outside of abdominal pain and related medical topics. Could you ask about symptoms, pain location, or related concerns?"
+OFF_TOPIC_RESPONSE = "I'm specifically trained to help with abdominal pain and digestive issues. Could you tell me more about any symptoms you're experiencing?"
+
+
+class QueryAnalysis:
+    """Per-turn analysis of a user message shared across the chat pipeline"""
+    
+    def __init__(self, text: str, query_embedding: Optional[np.ndarray] = None,
+                 budget: Optional[LatencyBudget] = None, timings: Optional[StageTimer] = None):
+        self.text = text
+        self.lowered = text.lower()
+        self.query_embedding = query_embedding
+        self.matches: Dict[str, List[str]] = {}
+        self.medical_info: List[Dict] = []
+        self.retrieved = False
+        self.retrieval_stage: Optional[str] = None
+        # Which path served the response: general, medical, conversational or error
+        self.response_path: Optional[str] = None
+        self.warning_signs: List[str] = []
+        self.keywords: Set[str] = set()
+        self.budget = budget if budget is not None else LatencyBudget(None)
+        self.timings = timings if timings is not None else StageTimer()
+        # Set by the chat service; keys the per-session conversation token cache
+        self.session_id: Optional[str] = None
+    
+    @property
+    def is_urgent(self) -> bool:
+        return bool(self.warning_signs)
 
-from data.medical_data import ABDOMINAL_PAIN_KNOWLEDGE
 
 class MedicalChatbotModel:
     """Transformer-based medical chatbot model"""
@@ -21,37 +57,387 @@ class MedicalChatbotModel:
         self.model_name = model_name
         self.tokenizer = None
         self.model = None
+        self.generation_engine = None
+        self.generation_batcher = None
         self.embedding_model = None
-        self.medical_embeddings = None
-        self.medical_knowledge = ABDOMINAL_PAIN_KNOWLEDGE
+        self.embedding_model_name = settings.EMBEDDING_MODEL
+        self.embedding_backend = settings.EMBEDDING_BACKEND
+        self.embedding_agreement: Optional[float] = None
+        # fp32 embedder kept until the configured backend's agreement is known
+        self._agreement_reference = None
+        self.embedding_batcher = None
+        self.embedding_cache = LRUCache(settings.EMBEDDING_CACHE_SIZE)
+        # Knowledge, keyword tables and index, replaced as a whole on reload
+        self.knowledge_path = settings.KNOWLEDGE_PATH
+        source_mtime = knowledge_mtime(self.knowledge_path)
+        self.snapshot = KnowledgeSnapshot(load_knowledge(self.knowledge_path), source_mtime=source_mtime)
+        self._reload_lock = threading.Lock()
+        self._last_reload_check = time.monotonic()
+        self._seen_mtime = source_mtime
+        self.last_reload: Optional[Dict] = None
+        self.retrieval_stages: Dict[str, int] = {}
+        self._stats_lock = threading.Lock()
+        # not_loaded, loading, ready or failed
+        self.model_state = {"embedder": "not_loaded", "conversational": "not_loaded"}
+        self._embedder_lock = threading.Lock()
+        self._conversational_lock = threading.Lock()
+        self.index_store = EmbeddingIndexStore(settings.VECTOR_DB_PATH, settings.EMBEDDING_DIMENSION)
+        self.context_cache = ConversationTokenCache(settings.CONTEXT_CACHE_SESSIONS, settings.CONTEXT_MAX_MESSAGES)
         
     def load_models(self):
         """Load pretrained models"""
-        try:
-            # Load conversational model
-            self.tokenizer = GPT2Tokenizer.from_pretrained(self.model_name)
-            self.model = GPT2LMHeadModel.from_pretrained(self.model_name)
-            
-            # Add padding token
-            self.tokenizer.pad_token = self.tokenizer.eos_token
+        self.load_embedder()
+        self.load_conversational_model()
+    
+    @property
+    def medical_knowledge(self) -> Dict:
+        return self.snapshot.knowledge
+    
+    @property
+    def keyword_matcher(self):
+        return self.snapshot.keyword_matcher
+    
+    @property
+    def medical_embeddings(self) -> Optional[Dict]:
+        return self.snapshot.index
+    
+    @property
+    def knowledge_version(self) -> Optional[str]:
+        return self.snapshot.version
+    
+    @property
+    def response_version(self) -> Tuple[Optional[str], str]:
+        """Changes whenever a reload could change a response, not only when the index does"""
+        snapshot = self.snapshot
+        return snapshot.version, snapshot.content_hash
+    
+    @property
+    def embedder_id(self) -> str:
+        """Model and backend; part of the index version since backends embed slightly differently"""
+        return f"{self.embedding_model_name}:{self.embedding_backend}"
+    
+    @property
+    def is_ready(self) -> bool:
+        """Medical retrieval is available once the embedder and index are loaded"""
+        return self.model_state["embedder"] == "ready"
+    
+    def load_conversational_model(self) -> bool:
+        """Load DialoGPT once; returns whether it is available"""
+        with self._conversational_lock:
+            if self.model_state["conversational"] in ("ready", "failed"):
+                return self.model is not None
+            self.model_state["conversational"] = "loading"
             
-            # Load embedding model
-            self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
+            try:
+                configure_torch_threads(settings.TORCH_INTRA_OP_THREADS, settings.TORCH_INTER_OP_THREADS)
+                from transformers import GPT2LMHeadModel, GPT2Tokenizer
+                
+                tokenizer = GPT2Tokenizer.from_pretrained(self.model_name)
+                model = GPT2LMHeadModel.from_pretrained(self.model_name)
+                
+                # Add padding token
+                tokenizer.pad_token = tokenizer.eos_token
+                
+                engine = CPUGenerationEngine(
+                    model,
+                    tokenizer,
+                    prefix=MEDICAL_CONTEXT,
+                    quantize=settings.GENERATION_QUANTIZE_INT8,
+                    reuse_prefix_cache=settings.GENERATION_REUSE_PREFIX_CACHE
+                )
+                self.tokenizer, self.model, self.generation_engine = tokenizer, engine.model, engine
+                
+                # Coalesce concurrent conversational fallbacks into batched generate() calls
+                if settings.GENERATION_BATCHING_ENABLED:
+                    self.generation_batcher = MicroBatcher(
+                        self._generate_batch,
+                        max_batch_size=settings.GENERATION_BATCH_MAX_SIZE,
+                        max_wait_ms=settings.GENERATION_BATCH_WAIT_MS,
+                        name="generation-batcher"
+                    )
+                self.model_state["conversational"] = "ready"
+                print("Conversational model loaded successfully!")
+            except Exception as e:
+                self.model_state["conversational"] = "failed"
+                print(f"Error loading conversational model: {e}")
+        
+        return self.model is not None
+    
+    def load_embedder(self) -> bool:
+        """Load the embedding model and knowledge index once; returns whether they are available"""
+        with self._embedder_lock:
+            if self.model_state["embedder"] in ("ready", "failed"):
+                return self.is_ready
+            self.model_state["embedder"] = "loading"
             
-            # Generate medical knowledge embeddings
+            try:
+                self._load_embedder()
+                self.model_state["embedder"] = "ready"
+            except Exception as e:
+                self.model_state["embedder"] = "failed"
+                print(f"Error loading embedding model: {e}")
+        
+        return self.is_ready
+    
+    def _load_embedder(self):
+        """Load embedding model and medical knowledge embeddings"""
+        configure_torch_threads(settings.TORCH_INTRA_OP_THREADS, settings.TORCH_INTER_OP_THREADS)
+        
+        # Load embedding model
+        self.embedding_model = self._create_embedder()
+        
+        # Coalesce concurrent query encodes into batched calls
+        if settings.EMBEDDING_BATCHING_ENABLED and self.embedding_batcher is None:
+            self.embedding_batcher = MicroBatcher(
+                self._encode_batch,
+                max_batch_size=settings.EMBEDDING_BATCH_MAX_SIZE,
+                max_wait_ms=settings.EMBEDDING_BATCH_WAIT_MS,
+                name="embedding-batcher"
+            )
+        
+        # Load or generate medical knowledge embeddings
+        with self._reload_lock:
             self._generate_medical_embeddings()
+            reference, self._agreement_reference = self._agreement_reference, None
+            if reference is not None and self.embedding_agreement < settings.EMBEDDING_MIN_AGREEMENT:
+                print(f"Agreement below EMBEDDING_MIN_AGREEMENT={settings.EMBEDDING_MIN_AGREEMENT}; using fp32 torch")
+                agreement = self.embedding_agreement
+                self.embedding_model, self.embedding_backend = reference, "torch"
+                self._generate_medical_embeddings()
+                self.embedding_agreement = agreement
+        
+        print("Embedding model loaded successfully!")
+    
+    def _create_embedder(self):
+        """Build the configured embedding backend, keeping its fp32 reference for the agreement check"""
+        backend = settings.EMBEDDING_BACKEND
+        try:
+            embedder = create_embedder(backend, self.embedding_model_name, onnx_dir=settings.EMBEDDING_ONNX_DIR)
+        except ImportError as e:
+            if backend == "torch":
+                raise
+            print(f"Embedding backend '{backend}' unavailable ({e}); using fp32 torch")
+            backend, embedder = "torch", create_embedder("torch", self.embedding_model_name)
+        
+        # The fp32 model the backend was built from; released once the check has passed
+        reference, embedder.reference = embedder.reference, None
+        if backend != "torch" and settings.EMBEDDING_MIN_AGREEMENT > 0:
+            self._agreement_reference = reference
+        
+        self.embedding_backend = backend
+        return embedder
+    
+    def _measure_agreement(self, corpus: List[str]) -> Optional[float]:
+        """Top-k agreement of the current backend with fp32 on a knowledge corpus
+        
+        Only run when an index is built; the result is stored with the index.
+        Knowledge reloads after startup keep the startup result.
+        """
+        if self.embedding_backend == "torch":
+            return None
+        if self._agreement_reference is None:
+            return self.embedding_agreement
+        
+        # Faster backends must return the same top-k knowledge matches as fp32
+        agreement = topk_agreement(
+            self._agreement_reference, self.embedding_model, corpus, top_k=settings.EMBEDDING_AGREEMENT_TOP_K
+        )
+        print(f"Embedding backend '{self.embedding_backend}' top-{settings.EMBEDDING_AGREEMENT_TOP_K} "
+              f"agreement with fp32: {agreement:.3f}")
+        return agreement
+    
+    def _generate_medical_embeddings(self, knowledge: Optional[Dict] = None,
+                                     source_mtime: Optional[float] = None) -> Dict:
+        """Build the index for a knowledge base, encoding only new or changed texts, and swap it in"""
+        current = self.snapshot
+        if knowledge is None:
+            knowledge, source_mtime = current.knowledge, current.source_mtime
+        medical_texts, medical_labels = self._render_medical_texts(knowledge)
+        content_hash = EmbeddingIndexStore.compute_hash(
+            knowledge["conditions"], medical_texts, self.embedder_id
+        )
+        
+        # Map the stored index zero-copy when the knowledge and model are unchanged
+        encoded = 0
+        index = self.index_store.load(content_hash)
+        if index is not None and index["agreement"] is None and self._agreement_reference is not None:
+            # Stored before agreement was recorded; rebuilt from its own rows
+            index = None
+        if index is None:
+            embeddings, encoded = self._embed_incrementally(medical_texts, current.index)
+            index = self.index_store.save(content_hash, medical_texts, medical_labels, embeddings,
+                                          self.embedder_id, self._measure_agreement(medical_texts))
+        self.embedding_agreement = index["agreement"]
+        
+        index["retriever"] = create_retriever(
+            settings.RETRIEVER_BACKEND,
+            index["embeddings"],
+            index_type=settings.FAISS_INDEX_TYPE,
+            hnsw_m=settings.FAISS_HNSW_M,
+            ef_search=settings.FAISS_EF_SEARCH,
+            nlist=settings.FAISS_NLIST,
+            nprobe=settings.FAISS_NPROBE
+        )
+        index["lexical"] = BM25Index(index["texts"])
+        
+        # A single reference swap: requests see either the old snapshot or the new one
+        self.snapshot = KnowledgeSnapshot(knowledge, index, source_mtime)
+        return {
+            "version": content_hash,
+            "conditions": len(medical_labels),
+            "encoded": encoded,
+            "reused": len(medical_texts) - encoded
+        }
+    
+    def _embed_incrementally(self, texts: List[str], previous: Optional[Dict]) -> Tuple[np.ndarray, int]:
+        """Embeddings for texts, copying rows of a previous index whose text is unchanged"""
+        if previous is None:
+            previous = self.index_store.load_reusable(self.embedder_id)
+        known = {text: row for row, text in enumerate(previous["texts"])} if previous else {}
+        
+        missing = list(dict.fromkeys(text for text in texts if text not in known))
+        encoded = dict(zip(missing, self.embedding_model.encode(missing))) if missing else {}
+        rows = [encoded[text] if text in encoded else previous["embeddings"][known[text]] for text in texts]
+        return np.vstack(rows).astype(np.float32), len(missing)
+    
+    def reload_knowledge(self) -> Dict:
+        """Re-read the knowledge file and swap in its keyword tables and index"""
+        with self._reload_lock:
+            started = time.perf_counter()
+            source_mtime = knowledge_mtime(self.knowledge_path)
+            knowledge = load_knowledge(self.knowledge_path)
             
-            print("Models loaded successfully!")
-            
-        except Exception as e:
-            print(f"Error loading models: {e}")
+            self._seen_mtime = source_mtime
+            if self.embedding_model is not None:
+                result = self._generate_medical_embeddings(knowledge, source_mtime)
+            else:
+                # The index is built against the new knowledge once the embedder loads
+                self.snapshot = KnowledgeSnapshot(knowledge, source_mtime=source_mtime)
+                result = {"version": None, "conditions": len(knowledge["conditions"]), "encoded": 0, "reused": 0}
             
-    def _generate_medical_embeddings(self):
-        """Generate embeddings for medical knowledge"""
+            result["seconds"] = round(time.perf_counter() - started, 4)
+            self.last_reload = result
+            print(f"Knowledge reloaded: {result}")
+            return result
+    
+    def reload_if_changed(self) -> bool:
+        """Reload when the knowledge file's mtime has changed; checks at most once per watch interval"""
+        if not self.knowledge_path:
+            return False
+        now = time.monotonic()
+        if now - self._last_reload_check < settings.KNOWLEDGE_WATCH_INTERVAL_SECONDS:
+            return False
+        self._last_reload_check = now
+        
+        source_mtime = knowledge_mtime(self.knowledge_path)
+        if source_mtime is None or source_mtime == self._seen_mtime:
+            return False
+        try:
+            self.reload_knowledge()
+            return True
+        except (OSError, ValueError) as e:
+            # Keep serving the current snapshot until the file changes again
+            print(f"Knowledge reload failed: {e}")
+            self._seen_mtime = source_mtime
+            return False
+    
+    def _encode_batch(self, texts: List[str]) -> List[np.ndarray]:
+        """Encode a batch of queries in one call and split the rows back out"""
+        return list(self.embedding_model.encode(texts))
+    
+    def _generate_batch(self, requests: List[Tuple[List[int], int, Optional[float]]]) -> List[List[int]]:
+        """Run queued (prompt token IDs, max new tokens, max time) requests as generation batches
+
+        A batch stops when the tightest latency budget in it runs out, so
+        requests are split into groups of similar deadlines, tightest first;
+        later groups are charged for the time the earlier ones took.
+        """
+        max_times = [max_time for _, _, max_time in requests]
+        results: List[Optional[List[int]]] = [None] * len(requests)
+        started = time.perf_counter()
+        for group in group_by_deadline(max_times, settings.GENERATION_BATCH_DEADLINE_SLACK):
+            max_time = max_times[group[0]]
+            if max_time is not None:
+                max_time = max(0.0, max_time - (time.perf_counter() - started))
+            outputs = self.generation_engine.generate_batch(
+                [requests[i][0] for i in group], [requests[i][1] for i in group],
+                temperature=settings.TEMPERATURE, max_time=max_time
+            )
+            for index, output_ids in zip(group, outputs):
+                results[index] = output_ids
+        return results
+    
+    def _encode_query(self, query: str) -> np.ndarray:
+        """Encode a single query, reusing the embedding of any normalized duplicate"""
+        # Messages without words share an empty key and are never cached
+        cache_key = normalize_text(query)
+        embedding = self.embedding_cache.get(cache_key) if cache_key else None
+        if embedding is not None:
+            return embedding
+        
+        if self.embedding_batcher is not None:
+            embedding = self.embedding_batcher.process(query)[None, :]
+        else:
+            embedding = self.embedding_model.encode([query])
+        if cache_key:
+            self.embedding_cache.put(cache_key, embedding)
+        return embedding
+    
+    def _encode_queries(self, queries: List[str]) -> List[np.ndarray]:
+        """Encode many queries with one model call, reusing cached embeddings"""
+        embeddings: List[Optional[np.ndarray]] = []
+        misses: Dict[str, List[int]] = {}
+        for position, query in enumerate(queries):
+            cache_key = normalize_text(query)
+            embedding = self.embedding_cache.get(cache_key) if cache_key else None
+            embeddings.append(embedding)
+            if embedding is None:
+                # Wordless queries are deduplicated on their raw text only
+                misses.setdefault((cache_key, query if not cache_key else ""), []).append(position)
+        
+        if misses:
+            texts = [queries[positions[0]] for positions in misses.values()]
+            encoded = self.embedding_model.encode(texts)
+            for ((cache_key, _), positions), embedding in zip(misses.items(), encoded):
+                embedding = embedding[None, :]
+                if cache_key:
+                    self.embedding_cache.put(cache_key, embedding)
+                for position in positions:
+                    embeddings[position] = embedding
+        return embeddings
+    
+    def get_stats(self) -> Dict:
+        """Runtime statistics for the model pipeline"""
+        with self._stats_lock:
+            stats = {"retrieval_stages": dict(self.retrieval_stages)}
+        stats["embedding_cache"] = self.embedding_cache.stats()
+        stats["context_cache"] = self.context_cache.stats()
+        stats["embedder"] = {
+            "model": self.embedding_model_name,
+            "backend": self.embedding_backend,
+            "fp32_agreement": self.embedding_agreement
+        }
+        stats["knowledge"] = {
+            "path": self.knowledge_path or None,
+            "version": self.knowledge_version,
+            "conditions": len(self.medical_knowledge["conditions"]),
+            "last_reload": self.last_reload
+        }
+        if self.generation_engine is not None:
+            stats["generation_engine"] = self.generation_engine.info()
+        if self.embedding_batcher is not None:
+            stats["embedding_batcher"] = self.embedding_batcher.stats()
+        if self.generation_batcher is not None:
+            stats["generation_batcher"] = self.generation_batcher.stats()
+        return stats
+    
+    def _render_medical_texts(self, knowledge: Optional[Dict] = None) -> Tuple[List[str], List[str]]:
+        """Render one searchable text per medical condition"""
         medical_texts = []
         medical_labels = []
+        knowledge = knowledge if knowledge is not None else self.medical_knowledge
         
-        for condition, info in self.medical_knowledge["conditions"].items():
+        for condition, info in knowledge["conditions"].items():
             # Create comprehensive text for each condition
             text = f"{condition}: {info['description']} "
             text += f"Symptoms: {', '.join(info['symptoms'])}. "
@@ -62,71 +448,215 @@ class MedicalChatbotModel:
             medical_texts.append(text)
             medical_labels.append(condition)
         
-        # Generate embeddings
-        embeddings = self.embedding_model.encode(medical_texts)
-        self.medical_embeddings = {
-            "texts": medical_texts,
-            "embeddings": embeddings,
-            "labels": medical_labels
-        }
+        return medical_texts, medical_labels
+        
+    def analyze_query(self, user_input: str, query_embedding: Optional[np.ndarray] = None,
+                      retrieve: bool = True, budget: Optional[LatencyBudget] = None,
+                      timings: Optional[StageTimer] = None) -> QueryAnalysis:
+        """Run retrieval and keyword matching once for a chat turn"""
+        analysis = QueryAnalysis(user_input, query_embedding, budget, timings)
+        
+        # One automaton pass finds intents, warning signs and symptom keywords
+        with analysis.timings.stage("intent"):
+            analysis.matches = self.keyword_matcher.match(user_input)
+        analysis.warning_signs = analysis.matches.get("warning", [])
+        analysis.keywords = set(analysis.matches.get("symptom", []))
         
-    def find_relevant_medical_info(self, query: str, top_k: int = 3) -> List[Dict]:
+        if retrieve:
+            self.retrieve(analysis)
+        
+        return analysis
+    
+    def retrieve(self, analysis: QueryAnalysis) -> QueryAnalysis:
+        """Attach retrieval results to an analysis if it has none yet"""
+        if analysis.retrieved:
+            return analysis
+        
+        snapshot = self.snapshot
+        if snapshot.index:
+            with analysis.timings.stage("retrieval"):
+                analysis.medical_info, analysis.query_embedding, analysis.retrieval_stage = self._search(
+                    snapshot, analysis.text, 3, analysis.query_embedding, timings=analysis.timings
+                )
+        analysis.retrieved = True
+        return analysis
+    
+    def find_relevant_medical_info(self, query: str, top_k: int = 3,
+                                   query_embedding: Optional[np.ndarray] = None,
+                                   min_similarity: float = 0.3) -> List[Dict]:
         """Find most relevant medical information for query"""
-        if not self.medical_embeddings:
+        snapshot = self.snapshot
+        if not snapshot.index:
             return []
-            
-        query_embedding = self.embedding_model.encode([query])
+        return self._search(snapshot, query, top_k, query_embedding, min_similarity)[0]
+    
+    def _search(self, snapshot: KnowledgeSnapshot, query: str, top_k: int, query_embedding: Optional[np.ndarray],
+                min_similarity: float = 0.3,
+                timings: Optional[StageTimer] = None) -> Tuple[List[Dict], Optional[np.ndarray], str]:
+        """Lexical-first retrieval cascade; returns (results, query embedding, stage used)"""
+        timings = timings if timings is not None else StageTimer()
+        
+        # Stage 1: BM25 over the condition texts; confident hits skip the embedder
+        lexical_hits, results = self._lexical_search(snapshot, query, top_k, query_embedding)
+        if results is not None:
+            return results, None, "lexical"
         
-        # Calculate similarities
-        similarities = np.dot(query_embedding, self.medical_embeddings["embeddings"].T)[0]
+        # Stage 2: dense similarity, fused with any lexical evidence
+        if query_embedding is None:
+            with timings.stage("embedding"):
+                query_embedding = self._encode_query(query)
+        query_embedding = np.asarray(query_embedding).reshape(1, -1)
         
-        # Get top-k most similar
-        top_indices = np.argsort(similarities)[-top_k:][::-1]
+        # Get top-k most similar from the configured retriever
+        scores, indices = snapshot.index["retriever"].search(query_embedding, top_k)
+        results, stage = self._dense_results(snapshot, query_embedding[0], scores[0], indices[0], lexical_hits,
+                                             top_k, min_similarity)
+        return results, query_embedding, stage
+    
+    def _lexical_search(self, snapshot: KnowledgeSnapshot, query: str, top_k: int,
+                        query_embedding: Optional[np.ndarray]
+                        ) -> Tuple[List[Tuple[int, float, float]], Optional[List[Dict]]]:
+        """BM25 hits for a query, plus final results when they are confident enough to skip the embedder"""
+        if not settings.LEXICAL_CASCADE_ENABLED or query_embedding is not None:
+            return [], None
+        
+        lexical_hits = snapshot.index["lexical"].search(query, top_k)
+        if not lexical_hits or not self._is_confident_lexical(lexical_hits):
+            return lexical_hits, None
+        
+        self._count_retrieval_stage("lexical")
+        top_score = lexical_hits[0][1]
+        results = [
+            self._retrieval_result(snapshot, idx, score / top_score, "lexical")
+            for idx, score, _ in lexical_hits
+            if score / top_score > 0.3
+        ]
+        return lexical_hits, results
+    
+    def _dense_results(self, snapshot: KnowledgeSnapshot, query_embedding: np.ndarray,
+                       scores: np.ndarray, indices: np.ndarray,
+                       lexical_hits: List[Tuple[int, float, float]], top_k: int,
+                       min_similarity: float) -> Tuple[List[Dict], str]:
+        """Rank one query's dense candidates, fusing in any lexical evidence"""
+        candidates = {int(idx): float(similarity) for similarity, idx in zip(scores, indices) if idx >= 0}
+        
+        stage = "dense"
+        ranking = dict(candidates)
+        if lexical_hits:
+            stage = "fused"
+            top_score = lexical_hits[0][1]
+            embeddings = snapshot.index["embeddings"]
+            for idx, score, _ in lexical_hits:
+                if idx not in candidates:
+                    candidates[idx] = float(np.dot(query_embedding, embeddings[idx]))
+                    ranking[idx] = candidates[idx]
+                ranking[idx] += settings.LEXICAL_FUSION_WEIGHT * score / top_score
+        self._count_retrieval_stage(stage)
         
         results = []
-        for idx in top_indices:
-            if similarities[idx] > 0.3:  # Minimum similarity threshold
-                condition = self.medical_embeddings["labels"][idx]
-                results.append({
-                    "condition": condition,
-                    "similarity": float(similarities[idx]),
-                    "info": self.medical_knowledge["conditions"][condition]
-                })
-                
-        return results
+        for idx in sorted(ranking, key=ranking.get, reverse=True)[:top_k]:
+            if candidates[idx] > min_similarity:  # Minimum similarity threshold
+                results.append(self._retrieval_result(snapshot, idx, candidates[idx], stage))
+        
+        return results, stage
+    
+    def retrieve_batch(self, analyses: List[QueryAnalysis], top_k: int = 3) -> List[QueryAnalysis]:
+        """Retrieve for many analyses at once: one encode call and one similarity search for the batch"""
+        snapshot = self.snapshot
+        pending = []
+        for analysis in analyses:
+            if analysis.retrieved:
+                continue
+            analysis.retrieved = True
+            if not snapshot.index:
+                continue
+            lexical_hits, results = self._lexical_search(snapshot, analysis.text, top_k, analysis.query_embedding)
+            if results is not None:
+                analysis.medical_info, analysis.retrieval_stage = results, "lexical"
+            else:
+                pending.append((analysis, lexical_hits))
+        
+        if not pending:
+            return analyses
+        
+        missing = [analysis for analysis, _ in pending if analysis.query_embedding is None]
+        for analysis, embedding in zip(missing, self._encode_queries([a.text for a in missing])):
+            analysis.query_embedding = embedding.reshape(1, -1)
+        
+        query_embeddings = np.vstack([np.asarray(analysis.query_embedding).reshape(1, -1)
+                                      for analysis, _ in pending])
+        scores, indices = snapshot.index["retriever"].search(query_embeddings, top_k)
+        for row, (analysis, lexical_hits) in enumerate(pending):
+            analysis.medical_info, analysis.retrieval_stage = self._dense_results(
+                snapshot, query_embeddings[row], scores[row], indices[row], lexical_hits, top_k, 0.3
+            )
+        return analyses
+    
+    def _is_confident_lexical(self, hits: List[Tuple[int, float, float]]) -> bool:
+        """A lexical hit is trusted when it is strong, covers the query and clearly leads"""
+        _, top_score, coverage = hits[0]
+        runner_up = hits[1][1] if len(hits) > 1 else 0.0
+        return top_score >= settings.LEXICAL_MIN_SCORE and \
+            coverage >= settings.LEXICAL_MIN_COVERAGE and \
+            (top_score - runner_up) / top_score >= settings.LEXICAL_CONFIDENCE_MARGIN
+    
+    def _retrieval_result(self, snapshot: KnowledgeSnapshot, idx: int, similarity: float, source: str) -> Dict:
+        condition = snapshot.index["labels"][idx]
+        return {
+            "condition": condition,
+            "similarity": float(similarity),
+            "source": source,
+            "info": snapshot.knowledge["conditions"][condition],
+            "template": snapshot.templates[condition]
+        }
+    
+    def _count_retrieval_stage(self, stage: str) -> None:
+        with self._stats_lock:
+            self.retrieval_stages[stage] = self.retrieval_stages.get(stage, 0) + 1
     
-    def generate_response(self, user_input: str, conversation_history: List[str] = None) -> str:
+    def generate_response(self, user_input: str, conversation_history: List[str] = None,
+                          analysis: Optional[QueryAnalysis] = None) -> str:
         """Generate chatbot response"""
         try:
+            if analysis is None:
+                analysis = self.analyze_query(user_input)
+            
             # Handle greetings and general questions
-            response = self._handle_general_questions(user_input.lower())
+            with analysis.timings.stage("templating"):
+                response = self._handle_general_questions(analysis.lowered, analysis.matches)
             if response:
+                analysis.response_path = "general"
                 return response
             
-            # Find relevant medical information
-            medical_info = self.find_relevant_medical_info(user_input)
+            # Use medical information found during analysis
+            medical_info = analysis.medical_info
             
             if medical_info:
-                return self._generate_medical_response(user_input, medical_info)
+                analysis.response_path = "medical"
+                with analysis.timings.stage("templating"):
+                    return self._generate_medical_response(user_input, medical_info, analysis)
             else:
-                return self._generate_conversational_response(user_input, conversation_history)
+                analysis.response_path = "conversational"
+                with analysis.timings.stage("generation"):
+                    return self._generate_conversational_response(user_input, conversation_history, analysis)
                 
         except Exception as e:
+            if analysis is not None:
+                analysis.response_path = "error"
             return "I apologize, but I'm having trouble processing your request. Could you please rephrase your question?"
     
-    def _handle_general_questions(self, user_input: str) -> str:
+    def _handle_general_questions(self, user_input: str, matches: Optional[Dict[str, List[str]]] = None) -> str:
         """Handle greetings and general questions"""
-        greetings = self.medical_knowledge["common_questions"]["greetings"]
-        how_are_you = self.medical_knowledge["common_questions"]["how_are_you"]
-        what_can_you_do = self.medical_knowledge["common_questions"]["what_can_you_do"]
+        if matches is None:
+            matches = self.keyword_matcher.match(user_input)
         
-        if any(greeting in user_input for greeting in greetings):
+        if "greetings" in matches:
             return "Hello! I'm here to help you understand abdominal pain and related symptoms. How can I assist you today?"
         
-        if any(phrase in user_input for phrase in how_are_you):
+        if "how_are_you" in matches:
             return "Thank you for asking! I'm doing well and ready to help you with any questions about abdominal pain. How are you feeling?"
         
-        if any(phrase in user_input for phrase in what_can_you_do):
+        if "what_can_you_do" in matches:
             return """I'm a medical assistant specialized in abdominal pain. I can help you:
             
 • Understand possible causes of abdominal pain
@@ -138,83 +668,226 @@ Please describe your symptoms, and I'll provide relevant information based on my
         
         return None
     
-    def _generate_medical_response(self, user_input: str, medical_info: List[Dict]) -> str:
+    def _generate_medical_response(self, user_input: str, medical_info: List[Dict],
+                                   analysis: Optional[QueryAnalysis] = None) -> str:
         """Generate medical response based on found information"""
         if not medical_info:
-            return "I don't have specific information about that in my abdominal pain knowledge base. Could you provide more details about your symptoms?"
+            return NO_MATCH_RESPONSE
         
-        # Get the most relevant condition
+        # The condition's answer body is pre-rendered when the knowledge is loaded
         top_condition = medical_info[0]
-        condition_name = top_condition["condition"].replace("_", " ").title()
-        info = top_condition["info"]
-        
-        response = f"Based on your symptoms, you might be experiencing {condition_name}.\n\n"
-        response += f"**Description:** {info['description']}\n\n"
-        response += f"**Common symptoms include:**\n"
-        for symptom in info['symptoms'][:4]:  # Show top 4 symptoms
-            response += f"• {symptom.title()}\n"
-        
-        response += f"\n**Typical characteristics:**\n"
-        response += f"• Location: {info['location']}\n"
-        response += f"• Severity: {info['severity']}\n"
-        response += f"• Duration: {info['duration']}\n"
-        
-        # Add warning if severe
-        if info['severity'] in ['severe', 'moderate to severe']:
-            response += f"\n⚠️ **Important:** This condition may require medical attention. "
-            response += f"Please consult a healthcare provider for proper diagnosis and treatment.\n"
+        template = top_condition.get("template")
+        if template is None:
+            template = compile_condition(top_condition["condition"], top_condition["info"])
         
         # Check for warning signs
-        warning_signs = self.medical_knowledge["warning_signs"]
-        if any(sign in user_input.lower() for sign in warning_signs):
-            response += f"\n🚨 **Urgent:** Your symptoms may indicate a serious condition. "
-            response += f"Please seek immediate medical attention or call emergency services.\n"
+        if analysis is not None:
+            is_urgent = analysis.is_urgent
+        else:
+            is_urgent = "warning" in self.keyword_matcher.match(user_input)
         
-        response += f"\n*This information is for educational purposes only and should not replace professional medical advice.*"
-        
-        return response
+        return template.render(is_urgent)
     
-    def _generate_conversational_response(self, user_input: str, conversation_history: List[str] = None) -> str:
+    def _generate_conversational_response(self, user_input: str, conversation_history: List[str] = None,
+                                          analysis: Optional[QueryAnalysis] = None) -> str:
         """Generate conversational response using transformer model"""
-        if not self.model or not self.tokenizer:
-            return "I'm not trained to answer questions outside of abdominal pain and related medical topics. Could you ask about symptoms, pain location, or related concerns?"
+        # Waiting out a background load would hold this turn's slots far past its budget
+        if self.model_state["conversational"] == "loading":
+            return self._budget_fallback_response(user_input, analysis)
+        
+        # DialoGPT is loaded lazily on the first conversational fallback
+        if not self.load_conversational_model():
+            return NOT_TRAINED_RESPONSE
         
+        budget = analysis.budget if analysis is not None else LatencyBudget(None)
+        max_time = budget.remaining_seconds()
+        if max_time is not None and max_time * 1000 < settings.MIN_GENERATION_MS:
+            return self._budget_fallback_response(user_input, analysis)
+        
+        session_id = analysis.session_id if analysis is not None else None
         try:
-            # Prepare input with medical context
-            medical_context = "You are a medical assistant specialized in abdominal pain. "
-            full_input = medical_context + user_input
-            
-            # Tokenize input
-            inputs = self.tokenizer.encode(full_input, return_tensors="pt", max_length=512, truncation=True)
+            # Prepare input with medical context and as much recent conversation as fits
+            inputs = self._build_prompt(user_input, conversation_history, session_id)
             
-            # Generate response
-            with torch.no_grad():
-                outputs = self.model.generate(
+            # Generate response, batched with concurrent fallbacks when enabled;
+            # max_time stops generation when the latency budget runs out
+            if self.generation_batcher is not None:
+                output_ids = self.generation_batcher.process(
+                    (inputs[0].tolist(), settings.GENERATION_MAX_NEW_TOKENS, max_time)
+                )
+            else:
+                output_ids = self.generation_engine.generate(
                     inputs,
-                    max_length=inputs.shape[1] + 100,
-                    num_return_sequences=1,
-                    temperature=0.7,
-                    do_sample=True,
-                    pad_token_id=self.tokenizer.eos_token_id
+                    max_new_tokens=settings.GENERATION_MAX_NEW_TOKENS,
+                    temperature=settings.TEMPERATURE,
+                    max_time=max_time
                 )
             
             # Decode response
-            response = self.tokenizer.decode(outputs[0], skip_special_tokens=True)
-            response = response[len(full_input):].strip()
+            response = self.tokenizer.decode(output_ids, skip_special_tokens=True).strip()
+            
+            if budget.expired:
+                # Cut off by the budget: keep complete sentences of an on-topic partial answer
+                response = self._trim_partial_response(response)
+                if not self._is_medical_related(response):
+                    return self._budget_fallback_response(user_input, analysis)
+                if analysis is not None:
+                    analysis.response_path = "partial_generation"
+                return response
             
             # Filter non-medical responses
             if not self._is_medical_related(response):
-                return "I'm specifically trained to help with abdominal pain and digestive issues. Could you tell me more about any symptoms you're experiencing?"
+                return OFF_TOPIC_RESPONSE
             
+            if response:
+                # The reply joins the history next turn; keep the IDs the model produced
+                output_ids = output_ids.tolist() if hasattr(output_ids, "tolist") else list(output_ids)
+                reply_ids = [token for token in output_ids if token != self.tokenizer.eos_token_id]
+                self.context_cache.remember(session_id, response, reply_ids)
             return response if response else "I'm not sure how to respond to that. Could you ask about abdominal pain symptoms?"
             
         except Exception as e:
             return "I'm not trained to answer questions outside of abdominal pain. Please ask about symptoms, causes, or when to see a doctor."
     
+    def _build_prompt(self, user_input: str, conversation_history: Optional[List[str]],
+                      session_id: Optional[str]):
+        """Prompt IDs with the newest earlier turns that fit in CONTEXT_TOKEN_BUDGET
+
+        Token IDs of earlier turns come from the session's cache, so each
+        turn only tokenizes its new message.
+        """
+        engine = self.generation_engine
+        history = list(conversation_history or [])
+        # The chat service passes history ending with the current message
+        if history and history[-1] == user_input:
+            history.pop()
+        
+        user_ids = self.context_cache.encode(session_id, user_input, engine.encode_text)
+        eos = self.tokenizer.eos_token_id
+        context_ids: List[int] = []
+        remaining = settings.CONTEXT_TOKEN_BUDGET
+        for content in reversed(history):
+            turn_ids = self.context_cache.encode(session_id, content, engine.encode_text)
+            if len(turn_ids) + 1 > remaining:
+                break
+            # DialoGPT separates turns with the end-of-text token
+            context_ids[:0] = turn_ids + [eos]
+            remaining -= len(turn_ids) + 1
+        return engine.build_prompt(user_ids, context_ids)
+    
+    def _trim_partial_response(self, response: str) -> str:
+        """Drop the unfinished trailing sentence of a generation that was cut short"""
+        end = max(response.rfind(mark) for mark in ".!?")
+        return response[:end + 1] if end > 0 else response
+    
+    def _budget_fallback_response(self, user_input: str, analysis: Optional[QueryAnalysis]) -> str:
+        """Best answer available without generation: a loose retrieval match or a fixed template"""
+        if analysis is not None:
+            medical_info = analysis.medical_info or self._loose_matches(analysis)
+            if medical_info:
+                analysis.response_path = "retrieval_fallback"
+                return self._generate_medical_response(user_input, medical_info, analysis)
+        
+        if analysis is not None:
+            analysis.response_path = "template_fallback"
+        return OFF_TOPIC_RESPONSE
+    
+    def _loose_matches(self, analysis: QueryAnalysis, top_k: int = 3) -> List[Dict]:
+        """Re-rank the turn's own query embedding with the budget fallback's looser threshold
+        
+        Retrieval already ran and was counted for this turn, so the cascade is not repeated.
+        """
+        snapshot = self.snapshot
+        if not snapshot.index or analysis.query_embedding is None:
+            return []
+        query_embedding = np.asarray(analysis.query_embedding).reshape(1, -1)
+        scores, indices = snapshot.index["retriever"].search(query_embedding, top_k)
+        return [
+            self._retrieval_result(snapshot, int(idx), float(similarity), analysis.retrieval_stage)
+            for similarity, idx in zip(scores[0], indices[0])
+            if idx >= 0 and similarity > settings.BUDGET_FALLBACK_MIN_SIMILARITY
+        ]
+    
+    def stream_response(self, user_input: str, conversation_history: List[str] = None,
+                        analysis: Optional[QueryAnalysis] = None) -> Iterator[str]:
+        """Stream a chatbot response; templated answers arrive as a single chunk"""
+        try:
+            if analysis is None:
+                analysis = self.analyze_query(user_input)
+            
+            with analysis.timings.stage("templating"):
+                response = self._handle_general_questions(analysis.lowered, analysis.matches)
+                analysis.response_path = "general"
+                if not response and analysis.medical_info:
+                    response = self._generate_medical_response(user_input, analysis.medical_info, analysis)
+                    analysis.response_path = "medical"
+            if not response:
+                analysis.response_path = "conversational"
+        except Exception as e:
+            if analysis is not None:
+                analysis.response_path = "error"
+            response = "I apologize, but I'm having trouble processing your request. Could you please rephrase your question?"
+        
+        if response:
+            yield response
+        else:
+            yield from self._stream_conversational_response(user_input, conversation_history, analysis)
+    
+    def _stream_conversational_response(self, user_input: str, conversation_history: List[str] = None,
+                                        analysis: Optional[QueryAnalysis] = None) -> Iterator[str]:
+        """Stream transformer output, holding it back until it passes the medical filter"""
+        if self.model_state["conversational"] == "loading":
+            yield self._budget_fallback_response(user_input, analysis)
+            return
+        
+        if not self.load_conversational_model():
+            yield NOT_TRAINED_RESPONSE
+            return
+        
+        session_id = analysis.session_id if analysis is not None else None
+        inputs = self._build_prompt(user_input, conversation_history, session_id)
+        stream = self.generation_engine.stream(
+            inputs,
+            max_new_tokens=settings.GENERATION_MAX_NEW_TOKENS,
+            temperature=settings.TEMPERATURE,
+            timeout=settings.STREAM_TIMEOUT_SECONDS
+        )
+        
+        # Hold back the first words until the medical filter has seen enough of them
+        buffered = ""
+        released = False
+        try:
+            for chunk in stream:
+                buffered += chunk
+                if released:
+                    yield chunk
+                elif self._is_medical_related(buffered):
+                    released = True
+                    yield buffered.lstrip()
+                elif len(buffered.split()) >= settings.STREAM_FILTER_WORDS:
+                    # Off-topic: stop generating instead of finishing a reply we will discard
+                    stream.close()
+                    yield OFF_TOPIC_RESPONSE
+                    return
+            
+            if not released:
+                yield OFF_TOPIC_RESPONSE
+                return
+            
+            # The reply joins the history next turn; keep the IDs the model produced
+            stream.close()
+            response = buffered.strip()
+            if response and stream.output_ids is not None:
+                reply_ids = [token for token in stream.output_ids if token != self.tokenizer.eos_token_id]
+                self.context_cache.remember(session_id, response, reply_ids)
+        except Exception as e:
+            stream.close()
+            if not released:
+                yield "I'm not trained to answer questions outside of abdominal pain. Please ask about symptoms, causes, or when to see a doctor."
+        finally:
+            # Also stops generation when the client disconnects mid-stream
+            stream.close()
+    
     def _is_medical_related(self, response: str) -> bool:
         """Check if response is medically related"""
-        medical_keywords = [
-            "pain", "symptom", "condition", "doctor", "medical", "treatment", 
-            "abdomen", "stomach", "digestive", "nausea", "fever", "diagnosis"
-        ]
-        return any(keyword in response.lower() for keyword in medical_keywords)
+        return "medical" in self.keyword_matcher.match(response)
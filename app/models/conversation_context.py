@@ -0,0 +1,54 @@
+import threading
+from collections import OrderedDict
+from typing import Callable, List, Optional
+
+from utils.cache import LRUCache
+
+
+class ConversationTokenCache:
+    """Process-local token IDs of earlier turns, per session
+
+    Each message is tokenized at most once per session, the first time it
+    is needed. Generated replies can be stored with the IDs the model
+    produced, so they are never tokenized at all.
+    """
+
+    def __init__(self, max_sessions: int = 1000, max_messages: int = 20):
+        self.max_messages = max_messages
+        self._sessions = LRUCache(max_sessions)
+        self._lock = threading.Lock()
+        self.encoded = 0
+        self.reused = 0
+
+    def _turns(self, session_id: str) -> "OrderedDict[str, List[int]]":
+        turns = self._sessions.get(session_id)
+        if turns is None:
+            turns = OrderedDict()
+            self._sessions.put(session_id, turns)
+        return turns
+
+    def remember(self, session_id: Optional[str], content: str, token_ids: List[int]) -> None:
+        if session_id is None:
+            return
+        with self._lock:
+            turns = self._turns(session_id)
+            turns[content] = list(token_ids)
+            turns.move_to_end(content)
+            while len(turns) > self.max_messages:
+                turns.popitem(last=False)
+
+    def encode(self, session_id: Optional[str], content: str, tokenize: Callable[[str], List[int]]) -> List[int]:
+        """Cached token IDs of a message, tokenizing it on first use"""
+        if session_id is not None:
+            with self._lock:
+                token_ids = self._turns(session_id).get(content)
+                if token_ids is not None:
+                    self.reused += 1
+                    return token_ids
+        token_ids = tokenize(content)
+        self.encoded += 1
+        self.remember(session_id, content, token_ids)
+        return token_ids
+
+    def stats(self) -> dict:
+        return {"sessions": len(self._sessions), "encoded": self.encoded, "reused": self.reused}
@@ -0,0 +1,189 @@
+import os
+from typing import Dict, List, Type
+
+import numpy as np
+
+from models.retrievers import recall_at_k
+
+# Fixed queries for checking a faster backend against the fp32 baseline
+AGREEMENT_QUERIES = [
+    "sharp pain in upper right abdomen",
+    "burning stomach pain after eating",
+    "nausea and vomiting",
+    "pain near my belly button moving to the lower right",
+    "cramping bloating and diarrhea",
+    "severe pain after fatty meals",
+    "heartburn and acid taste in my mouth",
+    "constipation and gas for weeks",
+    "fever with lower abdominal pain",
+    "stomach ache after drinking milk",
+    "blood in my stool",
+    "bloated and full all the time",
+]
+
+
+class TorchEmbedder:
+    """SentenceTransformer encoding in fp32 PyTorch"""
+
+    name = "torch"
+    # fp32 embedder built from the same weights, kept by faster backends for the agreement check
+    reference = None
+
+    def __init__(self, model_name: str, model=None, **options):
+        if model is None:
+            from sentence_transformers import SentenceTransformer
+
+            model = SentenceTransformer(model_name, device="cpu")
+        self.model_name = model_name
+        self.model = model
+        self.model.eval()
+
+    def encode(self, texts: List[str], batch_size: int = 32, **kwargs) -> np.ndarray:
+        import torch
+
+        # inference_mode skips the autograd version tracking that no_grad still does
+        with torch.inference_mode():
+            embeddings = self.model.encode(texts, batch_size=batch_size, convert_to_numpy=True,
+                                           show_progress_bar=False)
+        return np.asarray(embeddings, dtype=np.float32)
+
+
+class TorchInt8Embedder(TorchEmbedder):
+    """SentenceTransformer with its Linear layers dynamically quantized to int8"""
+
+    name = "torch_int8"
+
+    def __init__(self, model_name: str, **options):
+        super().__init__(model_name)
+        import torch
+        import torch.nn as nn
+
+        # quantize_dynamic returns a copy, leaving the fp32 model intact as the reference
+        self.reference = TorchEmbedder(model_name, model=self.model)
+        self.model = torch.quantization.quantize_dynamic(self.model, {nn.Linear}, dtype=torch.qint8)
+
+
+class OnnxEmbedder:
+    """Transformer exported to ONNX and run with onnxruntime on CPU
+
+    Tokenization, pooling and normalization reproduce the SentenceTransformer
+    pipeline in numpy. The export is cached on disk and reused across starts.
+    """
+
+    name = "onnx"
+    reference = None
+
+    def __init__(self, model_name: str, onnx_dir: str = "data/onnx", **options):
+        import onnxruntime as ort
+        from sentence_transformers import SentenceTransformer
+
+        self.model_name = model_name
+        source = SentenceTransformer(model_name, device="cpu")
+        self.tokenizer = source.tokenizer
+        self.max_length = source.max_seq_length
+        self.pooling, self.normalize = self._pipeline(source)
+
+        path = os.path.join(onnx_dir, model_name.replace("/", "_") + ".onnx")
+        if not os.path.exists(path):
+            self._export(source, path)
+        self.reference = TorchEmbedder(model_name, model=source)
+
+        session_options = ort.SessionOptions()
+        session_options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(path, session_options, providers=["CPUExecutionProvider"])
+        self.input_names = [model_input.name for model_input in self.session.get_inputs()]
+
+    @staticmethod
+    def _pipeline(source):
+        """Pooling mode and whether embeddings are L2-normalized"""
+        from sentence_transformers.models import Normalize, Pooling
+
+        pooling = None
+        normalize = False
+        for module in source:
+            if isinstance(module, Pooling):
+                pooling = module.get_pooling_mode_str()
+            normalize = normalize or isinstance(module, Normalize)
+        if pooling not in ("mean", "cls"):
+            raise ValueError(f"Unsupported pooling '{pooling}' for ONNX export of {source}")
+        return pooling, normalize
+
+    def _export(self, source, path: str) -> None:
+        import torch
+
+        transformer = source[0].auto_model.eval()
+
+        class HiddenStates(torch.nn.Module):
+            def __init__(self):
+                super().__init__()
+                self.transformer = transformer
+
+            def forward(self, input_ids, attention_mask, token_type_ids=None):
+                return self.transformer(input_ids=input_ids, attention_mask=attention_mask,
+                                        token_type_ids=token_type_ids)[0]
+
+        dummy = self.tokenizer(["abdominal pain"], return_tensors="pt")
+        input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in dummy]
+        dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+        dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with torch.inference_mode():
+            torch.onnx.export(
+                HiddenStates(),
+                tuple(dummy[name] for name in input_names),
+                tmp_path,
+                input_names=input_names,
+                output_names=["last_hidden_state"],
+                dynamic_axes=dynamic_axes,
+                opset_version=14
+            )
+        os.replace(tmp_path, path)
+        print(f"Exported {self.model_name} to {path}")
+
+    def encode(self, texts: List[str], batch_size: int = 32, **kwargs) -> np.ndarray:
+        batches = []
+        for start in range(0, len(texts), batch_size):
+            encoded = self.tokenizer(texts[start:start + batch_size], padding=True, truncation=True,
+                                     max_length=self.max_length, return_tensors="np")
+            feed = {name: encoded[name].astype(np.int64) for name in self.input_names}
+            hidden = self.session.run(None, feed)[0]
+
+            if self.pooling == "cls":
+                pooled = hidden[:, 0]
+            else:
+                mask = feed["attention_mask"][:, :, None].astype(np.float32)
+                pooled = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+            batches.append(pooled)
+
+        embeddings = np.concatenate(batches).astype(np.float32)
+        if self.normalize:
+            embeddings /= np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+        return embeddings
+
+
+EMBEDDERS: Dict[str, Type] = {
+    TorchEmbedder.name: TorchEmbedder,
+    TorchInt8Embedder.name: TorchInt8Embedder,
+    OnnxEmbedder.name: OnnxEmbedder,
+}
+
+
+def create_embedder(backend: str, model_name: str, **options):
+    """Build the embedding backend registered under the given name"""
+    if backend not in EMBEDDERS:
+        raise ValueError(f"Unknown embedding backend '{backend}'. Choose from: {', '.join(EMBEDDERS)}")
+    return EMBEDDERS[backend](model_name, **options)
+
+
+def topk_agreement(reference, candidate, corpus: List[str], queries: List[str] = AGREEMENT_QUERIES,
+                   top_k: int = 3) -> float:
+    """Recall@k of the candidate backend's top-k knowledge matches against the reference backend's"""
+    top_k = min(top_k, len(corpus))
+
+    def top_indices(embedder):
+        scores = np.dot(embedder.encode(queries), embedder.encode(corpus).T)
+        return np.argsort(-scores, axis=1)[:, :top_k]
+
+    return recall_at_k(top_indices(reference), top_indices(candidate))
@@ -0,0 +1,140 @@
+import hashlib
+import json
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# Bump when the on-disk layout changes so stale artifacts are rebuilt
+INDEX_FORMAT_VERSION = 1
+
+
+class EmbeddingIndexStore:
+    """Versioned on-disk store for medical knowledge embeddings
+
+    The index is kept as a float32 ``.npy`` matrix next to a small JSON
+    metadata file. The matrix file name carries the content hash, so a
+    rebuild never overwrites a file another worker has memory-mapped.
+    """
+
+    META_FILE = "medical_embeddings.json"
+
+    def __init__(self, path: str, dimension: int):
+        self.path = path
+        self.dimension = dimension
+
+    @staticmethod
+    def compute_hash(knowledge: Dict, texts: List[str], model_name: str) -> str:
+        """Hash the knowledge content and embedding model into an index version"""
+        digest = hashlib.sha256()
+        digest.update(f"format:{INDEX_FORMAT_VERSION}\n".encode("utf-8"))
+        digest.update(f"model:{model_name}\n".encode("utf-8"))
+        digest.update(json.dumps(knowledge, sort_keys=True, ensure_ascii=False).encode("utf-8"))
+        for text in texts:
+            digest.update(b"\0")
+            digest.update(text.encode("utf-8"))
+        return digest.hexdigest()
+
+    def _matrix_file(self, content_hash: str) -> str:
+        return f"medical_embeddings-{content_hash[:16]}.npy"
+
+    def load(self, content_hash: str) -> Optional[Dict]:
+        """Memory-map a stored index if it matches the given content hash"""
+        return self._load(lambda meta: meta.get("hash") == content_hash)
+
+    def load_reusable(self, model_name: str) -> Optional[Dict]:
+        """Memory-map the stored index of any knowledge version built with the given model
+
+        Rows of unchanged texts can be copied from it instead of re-encoded.
+        """
+        return self._load(lambda meta: meta.get("model") == model_name)
+
+    def _load(self, matches) -> Optional[Dict]:
+        meta_path = os.path.join(self.path, self.META_FILE)
+        if not os.path.exists(meta_path):
+            return None
+
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+
+            if not matches(meta) or meta.get("dimension") != self.dimension:
+                return None
+
+            # Read-only mapping: workers on the same host share the page cache
+            embeddings = np.load(os.path.join(self.path, meta["matrix_file"]), mmap_mode="r")
+            if embeddings.dtype != np.float32 or embeddings.shape != (len(meta["labels"]), self.dimension):
+                return None
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Ignoring unreadable embedding index: {e}")
+            return None
+
+        return {
+            "texts": meta["texts"],
+            "embeddings": embeddings,
+            "labels": meta["labels"],
+            "hash": meta["hash"],
+            "agreement": meta.get("agreement")
+        }
+
+    def save(self, content_hash: str, texts: List[str], labels: List[str], embeddings: np.ndarray,
+             model_name: Optional[str] = None, agreement: Optional[float] = None) -> Dict:
+        """Persist an index and return it in the in-memory layout
+
+        `agreement` is the backend's top-k agreement with fp32 on these texts,
+        so later starts with the same hash can skip the check.
+        """
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        index = {
+            "texts": texts,
+            "embeddings": embeddings,
+            "labels": labels,
+            "hash": content_hash,
+            "agreement": agreement
+        }
+
+        if embeddings.shape[1] != self.dimension:
+            print(f"Embedding dimension {embeddings.shape[1]} does not match "
+                  f"EMBEDDING_DIMENSION={self.dimension}; index not persisted")
+            return index
+
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            matrix_file = self._matrix_file(content_hash)
+
+            # Write the matrix before the metadata that points at it
+            self._atomic_write(matrix_file, lambda f: np.save(f, embeddings))
+            meta = {
+                "format": INDEX_FORMAT_VERSION,
+                "hash": content_hash,
+                "dimension": self.dimension,
+                "model": model_name,
+                "agreement": agreement,
+                "matrix_file": matrix_file,
+                "labels": labels,
+                "texts": texts
+            }
+            self._atomic_write(self.META_FILE, lambda f: f.write(json.dumps(meta).encode("utf-8")))
+            self._remove_stale_matrices(matrix_file)
+        except OSError as e:
+            print(f"Could not persist embedding index: {e}")
+
+        return index
+
+    def _atomic_write(self, file_name: str, write) -> None:
+        target = os.path.join(self.path, file_name)
+        tmp_path = f"{target}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, target)
+
+    def _remove_stale_matrices(self, current_file: str) -> None:
+        # Unlinking is safe for readers that still have the old file mapped
+        for name in os.listdir(self.path):
+            if name.startswith("medical_embeddings-") and name.endswith(".npy") and name != current_file:
+                try:
+                    os.remove(os.path.join(self.path, name))
+                except OSError:
+                    pass
@@ -0,0 +1,293 @@
+import threading
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+_threads_configured = False
+_threads_lock = threading.Lock()
+
+
+def configure_torch_threads(intra_op_threads: int = 0, inter_op_threads: int = 0) -> None:
+    """Apply per-worker torch thread counts once per process (0 keeps torch's default)"""
+    global _threads_configured
+    with _threads_lock:
+        if _threads_configured:
+            return
+        _threads_configured = True
+
+        import torch
+
+        if intra_op_threads > 0:
+            torch.set_num_threads(intra_op_threads)
+        if inter_op_threads > 0:
+            try:
+                # Only allowed before torch has started any inter-op parallel work
+                torch.set_num_interop_threads(inter_op_threads)
+            except RuntimeError as e:
+                print(f"Could not set inter-op threads: {e}")
+
+
+def _conv1d_to_linear(module) -> None:
+    """Swap GPT-2's Conv1D projections for equivalent nn.Linear layers, in place
+
+    Dynamic quantization only targets nn.Linear, and GPT-2 implements its
+    attention and MLP projections as transformers' Conv1D (weight stored
+    transposed), so without this only the LM head would be quantized.
+    """
+    import torch.nn as nn
+    try:
+        from transformers.pytorch_utils import Conv1D
+    except ImportError:
+        from transformers.modeling_utils import Conv1D
+
+    for name, child in module.named_children():
+        if isinstance(child, Conv1D):
+            in_features, out_features = child.weight.shape
+            linear = nn.Linear(in_features, out_features)
+            linear.weight.data = child.weight.data.t().contiguous()
+            linear.bias.data = child.bias.data
+            setattr(module, name, linear)
+        else:
+            _conv1d_to_linear(child)
+
+
+def quantize_int8(model):
+    """Return a dynamically int8-quantized copy of a causal LM for CPU inference"""
+    import torch
+    import torch.nn as nn
+
+    _conv1d_to_linear(model)
+    return torch.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+
+
+def left_pad(prompts: List[List[int]], pad_id: int) -> Tuple[List[List[int]], List[List[int]]]:
+    """Left-pad prompts to a common width, returning the padded IDs and attention mask"""
+    width = max(len(prompt) for prompt in prompts)
+    input_ids = [[pad_id] * (width - len(prompt)) + list(prompt) for prompt in prompts]
+    attention_mask = [[0] * (width - len(prompt)) + [1] * len(prompt) for prompt in prompts]
+    return input_ids, attention_mask
+
+
+def trim_batch_outputs(rows: List[List[int]], max_new_tokens: List[int], eos_id: int) -> List[List[int]]:
+    """Cut each generated row back to its own token limit and first EOS"""
+    results = []
+    for row, limit in zip(rows, max_new_tokens):
+        row = list(row[:limit])
+        # Finished rows are padded with EOS until the longest row is done
+        if eos_id in row:
+            row = row[:row.index(eos_id) + 1]
+        results.append(row)
+    return results
+
+
+def group_by_deadline(max_times: List[Optional[float]], slack: float) -> List[List[int]]:
+    """Indices of batch requests grouped so no request is cut to a much tighter deadline
+
+    Groups are ordered tightest deadline first; a request joins the current
+    group while its deadline is within `slack` times the group's tightest.
+    Requests without a deadline share a final group.
+    """
+    order = sorted(range(len(max_times)),
+                   key=lambda i: (max_times[i] is None, max_times[i] or 0.0))
+    groups: List[List[int]] = []
+    tightest: Optional[float] = None
+    for index in order:
+        max_time = max_times[index]
+        if groups and (max_time is None) == (tightest is None) and \
+                (max_time is None or max_time <= tightest * slack):
+            groups[-1].append(index)
+        else:
+            groups.append([index])
+            tightest = max_time
+    return groups
+
+
+class GenerationStream:
+    """Decoded text of a generation running on a worker thread
+
+    Iterating yields text chunks as tokens are produced. `close()` stops
+    generation at the next token and waits for the worker; once generation
+    has finished, `output_ids` holds the new token IDs.
+    """
+
+    def __init__(self, generate: Callable[[threading.Event], List[int]], chunks: Iterable[str],
+                 end: Callable[[], None]):
+        self.output_ids: Optional[List[int]] = None
+        self._chunks = chunks
+        self._end = end
+        self._abort = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(generate,), daemon=True)
+        self._thread.start()
+
+    def _run(self, generate: Callable[[threading.Event], List[int]]) -> None:
+        try:
+            self.output_ids = generate(self._abort)
+        except Exception as e:
+            print(f"Streaming generation failed: {e}")
+            # Wake the reader instead of leaving it waiting for text that will not come
+            self._end()
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._chunks)
+
+    def close(self) -> None:
+        """Stop generation at the next token and wait for the worker thread"""
+        self._abort.set()
+        self._thread.join()
+
+
+def supports_prefix_cache() -> bool:
+    """generate() only continues from a multi-token cached prefix from transformers 4.36"""
+    import transformers
+    major, minor = (int(part) for part in transformers.__version__.split(".")[:2])
+    return (major, minor) >= (4, 36)
+
+
+class CPUGenerationEngine:
+    """CPU inference backend for the conversational model
+
+    Optionally swaps in a dynamic int8 copy of the model and keeps the
+    past key/values of the fixed prompt prefix, so each call only runs the
+    model over the user's tokens before sampling.
+    """
+
+    def __init__(self, model, tokenizer, prefix: str, quantize: bool = False,
+                 reuse_prefix_cache: bool = True, max_input_tokens: int = 512):
+        if quantize:
+            model = quantize_int8(model)
+        model.eval()
+
+        self.model = model
+        self.tokenizer = tokenizer
+        self.quantized = quantize
+        self.max_input_tokens = max_input_tokens
+        self.prefix_ids: List[int] = tokenizer.encode(prefix.rstrip())
+        self.reuse_prefix_cache = reuse_prefix_cache and supports_prefix_cache()
+        if reuse_prefix_cache and not self.reuse_prefix_cache:
+            print("Prefix KV cache reuse needs transformers>=4.36; re-encoding the prefix per call")
+        self._prefix_past = None
+        self._prefix_lock = threading.Lock()
+
+    def encode_text(self, text: str) -> List[int]:
+        """Token IDs for one utterance as it appears after the prefix"""
+        # A leading space keeps GPT-2's BPE identical to tokenizing prefix and input together
+        return self.tokenizer.encode(" " + text.strip())
+
+    def encode_prompt(self, user_input: str):
+        """Token IDs for prefix + user input, truncating the user part to fit"""
+        return self.build_prompt(self.encode_text(user_input))
+
+    def build_prompt(self, user_ids: List[int], context_ids: List[int] = ()):
+        """Prefix + earlier turns + user input, dropping the oldest context and then the input's tail to fit"""
+        import torch
+
+        room = max(1, self.max_input_tokens - len(self.prefix_ids))
+        user_ids = user_ids[:room]
+        context_ids = list(context_ids)[max(0, len(context_ids) - (room - len(user_ids))):]
+        return torch.tensor([self.prefix_ids + context_ids + user_ids])
+
+    def _prefix_cache(self):
+        """Fresh cache object seeded with the prefix's past key/values"""
+        import torch
+
+        with self._prefix_lock:
+            if self._prefix_past is None:
+                with torch.inference_mode():
+                    outputs = self.model(torch.tensor([self.prefix_ids]), use_cache=True)
+                past = outputs.past_key_values
+                if hasattr(past, "to_legacy_cache"):
+                    past = past.to_legacy_cache()
+                self._prefix_past = past
+
+        # Cache objects grow in place during generate(); give each call its own.
+        # DynamicCache.update concatenates into new tensors, so the shared prefix is never modified.
+        try:
+            from transformers import DynamicCache
+            return DynamicCache.from_legacy_cache(self._prefix_past)
+        except ImportError:
+            return self._prefix_past
+
+    def generate(self, input_ids, max_new_tokens: int = 100, do_sample: bool = True,
+                 temperature: float = 0.7, **generate_kwargs):
+        """Generate a continuation and return only the new token IDs"""
+        import torch
+
+        kwargs = dict(
+            max_new_tokens=max_new_tokens,
+            num_return_sequences=1,
+            do_sample=do_sample,
+            pad_token_id=self.tokenizer.eos_token_id,
+            attention_mask=torch.ones_like(input_ids),
+            **generate_kwargs
+        )
+        if do_sample:
+            kwargs["temperature"] = temperature
+
+        starts_with_prefix = input_ids.shape[1] > len(self.prefix_ids) and \
+            input_ids[0, :len(self.prefix_ids)].tolist() == self.prefix_ids
+        if self.reuse_prefix_cache and starts_with_prefix:
+            kwargs["past_key_values"] = self._prefix_cache()
+
+        with torch.inference_mode():
+            outputs = self.model.generate(input_ids, **kwargs)
+        return outputs[0, input_ids.shape[1]:]
+
+    def stream(self, input_ids, max_new_tokens: int = 100, do_sample: bool = True,
+               temperature: float = 0.7, timeout: Optional[float] = None) -> GenerationStream:
+        """Start generating on a worker thread, returning the decoded text as it is produced"""
+        from transformers import StoppingCriteria, StoppingCriteriaList, TextIteratorStreamer
+
+        streamer = TextIteratorStreamer(self.tokenizer, skip_prompt=True, skip_special_tokens=True,
+                                        timeout=timeout)
+
+        def generate(abort: threading.Event) -> List[int]:
+            class AbortCriteria(StoppingCriteria):
+                def __call__(self, input_ids, scores, **kwargs) -> bool:
+                    return abort.is_set()
+
+            output_ids = self.generate(input_ids, max_new_tokens, do_sample, temperature, streamer=streamer,
+                                       stopping_criteria=StoppingCriteriaList([AbortCriteria()]))
+            return output_ids.tolist()
+
+        return GenerationStream(generate, streamer, streamer.end)
+
+    def generate_batch(self, prompts: List[List[int]], max_new_tokens: List[int], do_sample: bool = True,
+                       temperature: float = 0.7, max_time: Optional[float] = None) -> List[List[int]]:
+        """Generate for several prompts in one left-padded call
+
+        Each row keeps its own new-token limit: the batch runs to the largest
+        limit and every output is cut back to its request's budget.
+        """
+        import torch
+
+        if len(prompts) == 1:
+            # A lone prompt can still use the cached prefix
+            output_ids = self.generate(torch.tensor([prompts[0]]), max_new_tokens[0], do_sample, temperature,
+                                       max_time=max_time)
+            return [output_ids.tolist()]
+
+        pad_id = self.tokenizer.eos_token_id
+        width = max(len(prompt) for prompt in prompts)
+        input_ids, attention_mask = left_pad(prompts, pad_id)
+
+        kwargs = dict(
+            attention_mask=torch.tensor(attention_mask),
+            max_new_tokens=max(max_new_tokens),
+            do_sample=do_sample,
+            pad_token_id=pad_id,
+            max_time=max_time
+        )
+        if do_sample:
+            kwargs["temperature"] = temperature
+
+        with torch.inference_mode():
+            outputs = self.model.generate(torch.tensor(input_ids), **kwargs)
+        return trim_batch_outputs(outputs[:, width:].tolist(), max_new_tokens, pad_id)
+
+    def info(self) -> dict:
+        import torch
+        return {
+            "quantized_int8": self.quantized,
+            "prefix_cache": self.reuse_prefix_cache,
+            "prefix_tokens": len(self.prefix_ids),
+            "intra_op_threads": torch.get_num_threads(),
+            "inter_op_threads": torch.get_num_interop_threads()
+        }
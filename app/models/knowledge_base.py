@@ -0,0 +1,61 @@
+import hashlib
+import json
+import os
+from typing import Dict, Optional
+
+from data.medical_data import ABDOMINAL_PAIN_KNOWLEDGE
+from utils.response_formatter import compile_templates
+from utils.text_processor import KeywordMatcher
+
+REQUIRED_CONDITION_FIELDS = ("symptoms", "causes", "severity", "duration", "location", "description")
+
+
+class KnowledgeSnapshot:
+    """Knowledge base, keyword tables, answer templates and search index swapped in as one unit
+
+    Snapshots are never modified after construction. Readers take a single
+    reference to the current snapshot, so a reload can never hand them a
+    knowledge base paired with another version's index. `version` only covers
+    what is embedded; `content_hash` covers every section, including the
+    warning signs and keyword tables that shape responses.
+    """
+
+    def __init__(self, knowledge: Dict, index: Optional[Dict] = None, source_mtime: Optional[float] = None):
+        self.knowledge = knowledge
+        self.keyword_matcher = KeywordMatcher.from_knowledge(knowledge)
+        self.templates = compile_templates(knowledge["conditions"])
+        self.index = index
+        self.version = index["hash"] if index else None
+        self.source_mtime = source_mtime
+        self.content_hash = hashlib.sha256(
+            json.dumps(knowledge, sort_keys=True, default=str).encode("utf-8")
+        ).hexdigest()[:16]
+
+
+def load_knowledge(path: Optional[str]) -> Dict:
+    """Read a JSON knowledge base, taking any missing top-level section from the bundled one"""
+    if not path:
+        return ABDOMINAL_PAIN_KNOWLEDGE
+
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    conditions = data.get("conditions")
+    if not isinstance(conditions, dict) or not conditions:
+        raise ValueError(f"{path}: 'conditions' must be a non-empty object")
+    for condition, info in conditions.items():
+        missing = [field for field in REQUIRED_CONDITION_FIELDS if field not in info]
+        if missing:
+            raise ValueError(f"{path}: condition '{condition}' is missing {', '.join(missing)}")
+
+    return {**ABDOMINAL_PAIN_KNOWLEDGE, **data}
+
+
+def knowledge_mtime(path: Optional[str]) -> Optional[float]:
+    """Modification time of the knowledge file, or None for the bundled knowledge"""
+    if not path:
+        return None
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
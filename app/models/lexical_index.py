@@ -0,0 +1,66 @@
+import heapq
+import math
+from collections import Counter
+from typing import Dict, List, Tuple
+
+from utils.text_processor import tokenize
+
+# Function words carry no evidence about a condition and inflate scores
+STOPWORDS = frozenset("""
+a about an and are as at be been but by can could do does for from had has have how i i'm if in
+into is it it's its like me my of on or so than that the their them then there these they this
+to was we were what what's when where which while who why will with would you your
+""".split())
+
+
+def _terms(text: str) -> List[str]:
+    return [token for token in tokenize(text) if token not in STOPWORDS]
+
+
+class BM25Index:
+    """Okapi BM25 ranking over an inverted index of knowledge texts"""
+
+    def __init__(self, documents: List[str], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.size = len(documents)
+        self.postings: Dict[str, List[Tuple[int, int]]] = {}
+
+        doc_lengths = []
+        for doc_id, document in enumerate(documents):
+            term_counts = Counter(_terms(document))
+            doc_lengths.append(sum(term_counts.values()))
+            for term, count in term_counts.items():
+                self.postings.setdefault(term, []).append((doc_id, count))
+
+        average_length = sum(doc_lengths) / self.size if self.size else 0.0
+        # Length normalisation depends only on the document, so fold it in up front
+        self._length_norm = [
+            k1 * (1 - b + b * length / average_length) if average_length else k1
+            for length in doc_lengths
+        ]
+        self.idf = {
+            term: math.log(1 + (self.size - len(postings) + 0.5) / (len(postings) + 0.5))
+            for term, postings in self.postings.items()
+        }
+
+    def search(self, query: str, top_k: int = 3) -> List[Tuple[int, float, float]]:
+        """Return (doc_id, score, coverage) for the best matching documents
+
+        Coverage is the fraction of distinct query terms found in the document.
+        """
+        query_terms = set(_terms(query))
+        scores: Dict[int, float] = {}
+        matched: Dict[int, int] = {}
+        for term in query_terms:
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = self.idf[term]
+            for doc_id, count in postings:
+                tf = count * (self.k1 + 1) / (count + self._length_norm[doc_id])
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf
+                matched[doc_id] = matched.get(doc_id, 0) + 1
+
+        best = heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+        return [(doc_id, score, matched[doc_id] / len(query_terms)) for doc_id, score in best]
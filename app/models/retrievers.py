@@ -0,0 +1,123 @@
+from typing import Dict, Tuple, Type
+
+import numpy as np
+
+
+class BaseRetriever:
+    """Nearest-neighbour search over knowledge embeddings"""
+
+    name = "base"
+
+    def __init__(self, embeddings: np.ndarray, **options):
+        self.size = embeddings.shape[0]
+        self.dimension = embeddings.shape[1]
+
+    def search(self, query_embeddings: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (scores, indices) of shape (n_queries, k), best match first"""
+        raise NotImplementedError
+
+
+class BruteForceRetriever(BaseRetriever):
+    """Exact search: full dot product and a full sort of every score"""
+
+    name = "brute_force"
+
+    def __init__(self, embeddings: np.ndarray, **options):
+        super().__init__(embeddings)
+        self.embeddings = embeddings
+
+    def search(self, query_embeddings: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        scores = np.dot(np.atleast_2d(query_embeddings), self.embeddings.T)
+        indices = np.argsort(scores, axis=1)[:, ::-1][:, :top_k]
+        return np.take_along_axis(scores, indices, axis=1), indices
+
+
+class PartitionRetriever(BaseRetriever):
+    """Exact cosine search that only sorts the top-k candidates"""
+
+    name = "exact"
+
+    def __init__(self, embeddings: np.ndarray, **options):
+        super().__init__(embeddings)
+        # Keep memory-mapped matrices zero-copy when they are already unit length
+        norms = np.linalg.norm(embeddings, axis=1)
+        if np.allclose(norms, 1.0, atol=1e-3):
+            self.embeddings = embeddings
+        else:
+            self.embeddings = (embeddings / np.maximum(norms, 1e-12)[:, None]).astype(np.float32)
+
+    def search(self, query_embeddings: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        queries = np.atleast_2d(query_embeddings).astype(np.float32, copy=False)
+        queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        scores = np.dot(queries, self.embeddings.T)
+
+        k = min(top_k, self.size)
+        if k < self.size:
+            candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        else:
+            candidates = np.tile(np.arange(self.size), (scores.shape[0], 1))
+
+        candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+        order = np.argsort(-candidate_scores, axis=1)
+        return np.take_along_axis(candidate_scores, order, axis=1), np.take_along_axis(candidates, order, axis=1)
+
+
+class FaissRetriever(BaseRetriever):
+    """Approximate inner-product search with a FAISS HNSW or IVF index"""
+
+    name = "faiss"
+
+    def __init__(self, embeddings: np.ndarray, index_type: str = "hnsw", hnsw_m: int = 32,
+                 ef_search: int = 64, nlist: int = 100, nprobe: int = 8, **options):
+        super().__init__(embeddings)
+        import faiss
+
+        vectors = np.ascontiguousarray(embeddings, dtype=np.float32)
+        vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+        if index_type == "hnsw":
+            self.index = faiss.IndexHNSWFlat(self.dimension, hnsw_m, faiss.METRIC_INNER_PRODUCT)
+            self.index.hnsw.efSearch = ef_search
+        elif index_type == "ivf":
+            # IVF needs at least one training vector per list
+            nlist = max(1, min(nlist, self.size))
+            quantizer = faiss.IndexFlatIP(self.dimension)
+            self.index = faiss.IndexIVFFlat(quantizer, self.dimension, nlist, faiss.METRIC_INNER_PRODUCT)
+            self.index.train(vectors)
+            self.index.nprobe = min(nprobe, nlist)
+            self._quantizer = quantizer
+        else:
+            raise ValueError(f"Unknown FAISS index type: {index_type}")
+
+        self.index.add(vectors)
+
+    def search(self, query_embeddings: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        queries = np.ascontiguousarray(np.atleast_2d(query_embeddings), dtype=np.float32)
+        queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        scores, indices = self.index.search(queries, min(top_k, self.size))
+        return scores, indices
+
+
+RETRIEVERS: Dict[str, Type[BaseRetriever]] = {
+    BruteForceRetriever.name: BruteForceRetriever,
+    PartitionRetriever.name: PartitionRetriever,
+    FaissRetriever.name: FaissRetriever,
+}
+
+
+def create_retriever(backend: str, embeddings: np.ndarray, **options) -> BaseRetriever:
+    """Build the retriever registered under the given backend name"""
+    if backend not in RETRIEVERS:
+        raise ValueError(f"Unknown retriever backend '{backend}'. Choose from: {', '.join(RETRIEVERS)}")
+    return RETRIEVERS[backend](embeddings, **options)
+
+
+def recall_at_k(reference_indices: np.ndarray, candidate_indices: np.ndarray) -> float:
+    """Fraction of the reference top-k neighbours that the candidate also returned"""
+    hits = 0
+    total = 0
+    for reference, candidate in zip(reference_indices, candidate_indices):
+        reference_set = set(int(i) for i in reference if i >= 0)
+        hits += len(reference_set & set(int(i) for i in candidate if i >= 0))
+        total += len(reference_set)
+    return hits / total if total else 1.0
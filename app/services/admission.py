@@ -0,0 +1,217 @@
+import asyncio
+import heapq
+import itertools
+import math
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional
+
+from utils.metrics import registry
+
+# Request classes in priority order; lower numbers are scheduled first
+REQUEST_CLASSES = ("urgent", "medical", "generative")
+PRIORITIES = {request_class: priority for priority, request_class in enumerate(REQUEST_CLASSES)}
+
+ADMISSION_QUEUE_WAIT_SECONDS = registry.histogram(
+    "admission_queue_wait_seconds", "Time a chat turn waited for a slot in its request class", ["class"]
+)
+ADMISSION_REJECTED = registry.counter(
+    "admission_rejected_total", "Chat turns shed because their request class was saturated", ["class"]
+)
+ADMISSION_QUEUE_DEPTH = registry.gauge(
+    "admission_queue_depth", "Chat turns waiting for a slot in each request class", ["class"]
+)
+ADMISSION_IN_FLIGHT = registry.gauge(
+    "admission_in_flight", "Admitted chat turns in each request class", ["class"]
+)
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request class has no free slot and no room left in its queue"""
+
+    def __init__(self, request_class: str, retry_after: int):
+        super().__init__(f"Too many pending '{request_class}' requests; retry in {retry_after}s")
+        self.request_class = request_class
+        self.retry_after = retry_after
+
+
+class PrioritySemaphore:
+    """asyncio semaphore that wakes the waiter with the lowest priority number first
+
+    Waiters of equal priority are woken in arrival order. A released slot is
+    handed straight to the next waiter, so a newly arriving request cannot
+    take it ahead of the queue.
+    """
+
+    def __init__(self, value: int):
+        self._value = value
+        self._waiters: List[list] = []
+        self._order = itertools.count()
+
+    def locked(self) -> bool:
+        return self._value <= 0
+
+    async def acquire(self, priority: int = 0) -> None:
+        if self._value > 0 and not self._waiters:
+            self._value -= 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, [priority, next(self._order), future])
+        try:
+            await future
+        except asyncio.CancelledError:
+            # Handed a slot just as we were cancelled; pass it on
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def release(self) -> None:
+        while self._waiters:
+            future = heapq.heappop(self._waiters)[2]
+            if not future.done():
+                future.set_result(None)
+                return
+        self._value += 1
+
+
+class RequestClassGate:
+    """Concurrency limit and bounded wait queue for one request class"""
+
+    def __init__(self, name: str, max_concurrency: int, max_queue: int):
+        self.name = name
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max(0, max_queue)
+        self.semaphore: Optional[PrioritySemaphore] = None
+        self.in_flight = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        # Smoothed seconds a turn holds its slot, for Retry-After estimates
+        self.service_seconds = 1.0
+
+    def retry_after(self) -> int:
+        """Seconds until the current queue should have drained"""
+        backlog = (self.waiting + 1) / self.max_concurrency
+        return max(1, math.ceil(backlog * self.service_seconds))
+
+    def update_gauges(self) -> None:
+        ADMISSION_QUEUE_DEPTH.set(self.waiting, self.name)
+        ADMISSION_IN_FLIGHT.set(self.in_flight, self.name)
+
+    def stats(self) -> Dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "service_seconds": round(self.service_seconds, 3)
+        }
+
+
+class AdmissionController:
+    """Per-class concurrency limits and load shedding in front of model inference
+
+    Each request class has its own slots and bounded queue, so a backlog of
+    generative small talk cannot hold up urgent or knowledge-base turns.
+    When a class's queue is full, or a turn waits longer than
+    `queue_timeout`, the turn is rejected with a Retry-After estimate
+    instead of queueing without bound.
+    """
+
+    def __init__(self, limits: Dict[str, tuple], queue_timeout: Optional[float] = None,
+                 enabled: bool = True):
+        self.enabled = enabled
+        self.queue_timeout = queue_timeout or None
+        self.gates = {
+            name: RequestClassGate(name, max_concurrency, max_queue)
+            for name, (max_concurrency, max_queue) in limits.items()
+        }
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def classify(matches: Dict[str, List[str]]) -> str:
+        """Request class from the keyword matches of a message"""
+        if matches.get("warning"):
+            return "urgent"
+        if matches.get("condition") or matches.get("medical") or matches.get("symptom"):
+            return "medical"
+        return "generative"
+
+    def _reject(self, gate: RequestClassGate) -> AdmissionRejected:
+        with self._lock:
+            gate.rejected += 1
+            retry_after = gate.retry_after()
+        ADMISSION_REJECTED.inc(gate.name)
+        return AdmissionRejected(gate.name, retry_after)
+
+    @asynccontextmanager
+    async def admit(self, request_class: str, max_wait: Optional[float] = None) -> AsyncIterator[float]:
+        """Hold a slot of the request class for the duration of the block, yielding the queue wait
+
+        `max_wait` further caps the queue timeout, typically at the turn's
+        remaining latency budget; a turn with no time left is shed at once.
+        """
+        gate = self.gates.get(request_class) if self.enabled else None
+        if gate is None:
+            yield 0.0
+            return
+
+        timeout = self.queue_timeout
+        if max_wait is not None:
+            if max_wait <= 0:
+                raise self._reject(gate)
+            timeout = max_wait if timeout is None else min(timeout, max_wait)
+
+        if gate.semaphore is None:
+            # Created on first use so it belongs to the server's running loop
+            gate.semaphore = PrioritySemaphore(gate.max_concurrency)
+        with self._lock:
+            if gate.semaphore.locked() and gate.waiting >= gate.max_queue:
+                full = True
+            else:
+                full = False
+                gate.waiting += 1
+        if full:
+            raise self._reject(gate)
+
+        gate.update_gauges()
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(gate.semaphore.acquire(), timeout)
+            timed_out = False
+        except asyncio.TimeoutError:
+            timed_out = True
+        finally:
+            with self._lock:
+                gate.waiting -= 1
+        waited = time.perf_counter() - started
+        ADMISSION_QUEUE_WAIT_SECONDS.observe(waited, gate.name)
+        if timed_out:
+            gate.update_gauges()
+            raise self._reject(gate)
+
+        with self._lock:
+            gate.in_flight += 1
+            gate.admitted += 1
+        gate.update_gauges()
+        admitted_at = time.perf_counter()
+        try:
+            yield waited
+        finally:
+            held = time.perf_counter() - admitted_at
+            with self._lock:
+                gate.in_flight -= 1
+                gate.service_seconds = 0.8 * gate.service_seconds + 0.2 * held
+            gate.semaphore.release()
+            gate.update_gauges()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "classes": {name: gate.stats() for name, gate in self.gates.items()}
+            }
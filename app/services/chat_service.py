@@ -1,16 +1,54 @@
-from typing import List, Dict, Optional
+from typing import Any, Callable, List, Dict, Optional, Tuple, Iterable, Iterator
+import asyncio
+import functools
 import uuid
 from datetime import datetime
 
-from models.chatbot_model import MedicalChatbotModel
+import numpy as np
+
+from config import settings
+from models.chatbot_model import MedicalChatbotModel, QueryAnalysis
+from services.admission import PRIORITIES, AdmissionController
+from services.inference_executor import InferenceExecutor
+from services.session_store import create_session_store
+from utils.cache import LRUCache
+from utils.text_processor import normalize_text
+from utils.metrics import CHAT_REQUEST_SECONDS, CHAT_RESPONSES, CHAT_STAGE_SECONDS
+from utils.response_formatter import build_suggestions, compile_condition
+from utils.timing import LatencyBudget, StageTimer
+
+# Response paths that are a pure function of the normalized message
+CACHEABLE_PATHS = ("general", "medical")
 
 class ChatService:
     """Main chat service handling conversations"""
     
-    def __init__(self):
+    def __init__(self, load_models: bool = True):
         self.chatbot_model = MedicalChatbotModel()
-        self.active_sessions = {}
-        self.load_models()
+        self.active_sessions = create_session_store(
+            settings.SESSION_BACKEND,
+            db_path=settings.SESSION_DB_PATH,
+            max_sessions=settings.SESSION_MAX_SESSIONS,
+            ttl_seconds=settings.SESSION_TTL_SECONDS,
+            max_messages=settings.SESSION_MAX_MESSAGES
+        )
+        self.response_cache = LRUCache(settings.RESPONSE_CACHE_SIZE, settings.RESPONSE_CACHE_TTL_SECONDS)
+        self.executor = InferenceExecutor(
+            mode=settings.INFERENCE_MODE,
+            max_workers=settings.INFERENCE_WORKERS,
+            max_in_flight=settings.INFERENCE_MAX_IN_FLIGHT
+        )
+        self.admission = AdmissionController(
+            {
+                "urgent": (settings.ADMISSION_URGENT_CONCURRENCY, settings.ADMISSION_URGENT_QUEUE),
+                "medical": (settings.ADMISSION_MEDICAL_CONCURRENCY, settings.ADMISSION_MEDICAL_QUEUE),
+                "generative": (settings.ADMISSION_GENERATIVE_CONCURRENCY, settings.ADMISSION_GENERATIVE_QUEUE)
+            },
+            queue_timeout=settings.ADMISSION_QUEUE_TIMEOUT_SECONDS,
+            enabled=settings.ADMISSION_ENABLED
+        )
+        if load_models:
+            self.load_models()
     
     def load_models(self):
         """Initialize chatbot models"""
@@ -19,83 +57,283 @@ class ChatService:
     def create_session(self) -> str:
         """Create new chat session"""
         session_id = str(uuid.uuid4())
-        self.active_sessions[session_id] = {
-            "messages": [],
-            "created_at": datetime.now(),
-            "user_context": {}
-        }
+        self.active_sessions.create(session_id)
         return session_id
     
-    def process_message(self, session_id: str, message: str) -> Dict:
+    def process_message(self, session_id: str, message: str,
+                        query_embedding: Optional[np.ndarray] = None,
+                        latency_budget_ms: Optional[float] = None, include_timings: bool = False) -> Dict:
         """Process user message and generate response"""
-        if session_id not in self.active_sessions:
-            session_id = self.create_session()
+        budget = self._start_budget(latency_budget_ms)
+        timings = StageTimer()
+        session_id, conversation_history = self._start_turn(session_id, message, timings)
         
-        session = self.active_sessions[session_id]
+        cached = self._get_cached_turn(message, timings)
+        if cached:
+            return self._finish_turn(session_id, *cached, "cache", budget, timings, include_timings)
         
-        # Add user message to history
-        session["messages"].append({
-            "role": "user",
-            "content": message,
-            "timestamp": datetime.now()
-        })
+        # Embed and analyze the message once for the whole turn
+        analysis = self.chatbot_model.analyze_query(message, query_embedding, budget=budget, timings=timings)
+        analysis.session_id = session_id
         
         # Generate response
-        conversation_history = [msg["content"] for msg in session["messages"][-5:]]  # Last 5 messages
-        response = self.chatbot_model.generate_response(message, conversation_history)
+        response = self.chatbot_model.generate_response(message, conversation_history, analysis)
         
-        # Add bot response to history
-        session["messages"].append({
-            "role": "assistant",
-            "content": response,
-            "timestamp": datetime.now()
-        })
+        return self._complete_turn(session_id, message, response, analysis, include_timings)
+    
+    async def process_message_async(self, session_id: str, message: str,
+                                    query_embedding: Optional[np.ndarray] = None,
+                                    latency_budget_ms: Optional[float] = None,
+                                    include_timings: bool = False) -> Dict:
+        """Process user message without blocking the event loop on model inference
+        
+        Raises AdmissionRejected, before the message is recorded, when the
+        turn's request class is saturated.
+        """
+        budget = self._start_budget(latency_budget_ms)
+        timings = StageTimer()
+        
+        cached = self._get_cached_turn(message, timings)
+        if cached:
+            session_id, _ = await self.call_session_store(self._start_turn, session_id, message, timings)
+            return await self.call_session_store(
+                self._finish_turn, session_id, *cached, "cache", budget, timings, include_timings
+            )
+        
+        # Keyword matching is cheap; greetings and general questions are answered on the loop
+        analysis = self.chatbot_model.analyze_query(
+            message, query_embedding, retrieve=False, budget=budget, timings=timings
+        )
+        with timings.stage("templating"):
+            response = self.chatbot_model._handle_general_questions(analysis.lowered, analysis.matches)
+        if response:
+            session_id, _ = await self.call_session_store(self._start_turn, session_id, message, timings)
+            analysis.session_id = session_id
+            analysis.response_path = "general"
+            return await self.call_session_store(
+                self._complete_turn, session_id, message, response, analysis, include_timings
+            )
+        
+        request_class = self.admission.classify(analysis.matches)
+        # Waiting past the budget would only buy a slot to spend on a budget fallback
+        async with self.admission.admit(request_class, budget.remaining_seconds()) as waited:
+            timings.record("admission", waited)
+            session_id, conversation_history = await self.call_session_store(
+                self._start_turn, session_id, message, timings
+            )
+            analysis.session_id = session_id
+            # The returned analysis carries the stage timings recorded by the worker
+            response, analysis = await self.executor.run_turn(
+                self.chatbot_model, message, conversation_history, analysis,
+                priority=PRIORITIES[request_class]
+            )
+        
+        return await self.call_session_store(
+            self._complete_turn, session_id, message, response, analysis, include_timings
+        )
+    
+    async def call_session_store(self, fn: Callable, *args) -> Any:
+        """Run fn, which touches the session store, in a thread when the store does blocking I/O"""
+        if not self.active_sessions.blocking:
+            return fn(*args)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, functools.partial(fn, *args))
+    
+    def stream_message(self, session_id: str, message: str, include_timings: bool = False) -> Iterator[Dict]:
+        """Process user message, yielding response chunks as they are generated"""
+        budget = LatencyBudget(None)
+        timings = StageTimer()
+        session_id, conversation_history = self._start_turn(session_id, message, timings)
+        yield {"type": "start", "session_id": session_id}
+        
+        cached = self._get_cached_turn(message, timings)
+        if cached:
+            yield {"type": "token", "text": cached[0]}
+            yield {"type": "end", **self._finish_turn(session_id, *cached, "cache", budget, timings, include_timings)}
+            return
+        
+        analysis = self.chatbot_model.analyze_query(message, budget=budget, timings=timings)
+        analysis.session_id = session_id
+        chunks = []
+        for chunk in self.chatbot_model.stream_response(message, conversation_history, analysis):
+            chunks.append(chunk)
+            yield {"type": "token", "text": chunk}
+        
+        result = self._complete_turn(session_id, message, "".join(chunks).strip(), analysis, include_timings)
+        yield {"type": "end", **result}
+    
+    def process_batch(self, items: List[Tuple[Optional[str], str]],
+                      latency_budget_ms: Optional[float] = None) -> List[Dict]:
+        """Process many (session_id, message) pairs, returning results in input order"""
+        return list(self.iter_batch(items, latency_budget_ms))
+    
+    def iter_batch(self, items: Iterable[Tuple[Optional[str], str]],
+                   latency_budget_ms: Optional[float] = None) -> Iterator[Dict]:
+        """Yield batch results in input order, one vectorized chunk at a time"""
+        chunk = []
+        for item in items:
+            chunk.append(item)
+            if len(chunk) >= settings.BATCH_CHUNK_SIZE:
+                yield from self._process_chunk(chunk, latency_budget_ms)
+                chunk = []
+        if chunk:
+            yield from self._process_chunk(chunk, latency_budget_ms)
+    
+    def _process_chunk(self, chunk: List[Tuple[Optional[str], str]],
+                       latency_budget_ms: Optional[float]) -> Iterator[Dict]:
+        """Match intents and retrieve for a whole chunk, then answer each turn in order"""
+        turns = []
+        for session_id, message in chunk:
+            timings = StageTimer()
+            cached = self._get_cached_turn(message, timings)
+            analysis = None
+            if cached is None:
+                analysis = self.chatbot_model.analyze_query(message, retrieve=False, timings=timings)
+            turns.append((session_id, message, timings, cached, analysis))
+        
+        # Greetings and general questions need no retrieval
+        needs_retrieval = [
+            analysis for _, _, _, _, analysis in turns
+            if analysis is not None and not self.chatbot_model._handle_general_questions(
+                analysis.lowered, analysis.matches
+            )
+        ]
+        self.chatbot_model.retrieve_batch(needs_retrieval)
         
+        # Session history is read turn by turn, so repeated sessions in one batch stay consistent
+        for session_id, message, timings, cached, analysis in turns:
+            session_id, conversation_history = self._start_turn(session_id, message, timings)
+            if cached is not None:
+                yield self._finish_turn(session_id, *cached, "cache", LatencyBudget(None), timings)
+                continue
+            analysis.session_id = session_id
+            # Items are generated one after another; each gets the full budget for its own turn
+            analysis.budget = self._start_budget(latency_budget_ms)
+            response = self.chatbot_model.generate_response(message, conversation_history, analysis)
+            yield self._complete_turn(session_id, message, response, analysis)
+    
+    def _start_budget(self, latency_budget_ms: Optional[float]) -> LatencyBudget:
+        """Latency budget for a turn, defaulting to the configured one"""
+        return LatencyBudget(settings.LATENCY_BUDGET_MS if latency_budget_ms is None else latency_budget_ms)
+    
+    def _start_turn(self, session_id: str, message: str, timings: StageTimer) -> Tuple[str, List[str]]:
+        """Resolve the session and record the user message"""
+        with timings.stage("session"):
+            if session_id not in self.active_sessions:
+                session_id = self.create_session()
+            
+            # Add user message to history
+            self.active_sessions.append(session_id, "user", message)
+            
+            # Trimmed further to CONTEXT_TOKEN_BUDGET tokens when fed to DialoGPT
+            conversation_history = self.active_sessions.recent_contents(session_id, settings.CONTEXT_MAX_MESSAGES)
+        return session_id, conversation_history
+    
+    def _cache_key(self, message: str) -> Optional[Tuple[Tuple[Optional[str], str], str]]:
+        """None for messages without words, which would all share one key"""
+        normalized = normalize_text(message)
+        if not normalized:
+            return None
+        return self.chatbot_model.response_version, normalized
+    
+    def _get_cached_turn(self, message: str, timings: StageTimer) -> Optional[Tuple[str, List[str]]]:
+        """Cached (response, suggestions) for a deterministic repeat of the message"""
+        key = self._cache_key(message)
+        if key is None:
+            return None
+        with timings.stage("cache"):
+            cached = self.response_cache.get(key)
+        if cached is None:
+            return None
+        response, suggestions = cached
+        return response, list(suggestions)
+    
+    def _complete_turn(self, session_id: str, message: str, response: str,
+                       analysis: QueryAnalysis, include_timings: bool = False) -> Dict:
+        """Build suggestions for a freshly generated response and cache deterministic turns"""
         # Generate suggestions
-        suggestions = self._generate_suggestions(message, response)
+        with analysis.timings.stage("suggestions"):
+            suggestions = self._generate_suggestions(message, response, analysis)
+        
+        # Sampled DialoGPT output is never cached
+        key = self._cache_key(message)
+        if key is not None and analysis.response_path in CACHEABLE_PATHS:
+            self.response_cache.put(key, (response, tuple(suggestions)))
+        
+        return self._finish_turn(session_id, response, suggestions, analysis.response_path,
+                                 analysis.budget, analysis.timings, include_timings)
+    
+    def _finish_turn(self, session_id: str, response: str, suggestions: List[str], path: str,
+                     budget: LatencyBudget, timings: StageTimer, include_timings: bool = False) -> Dict:
+        """Record the bot response, observe the turn's metrics and build the API result"""
+        # Add bot response to history
+        with timings.stage("session"):
+            self.active_sessions.append(session_id, "assistant", response)
+        
+        path = path or "error"
+        for stage, seconds in timings.stages.items():
+            CHAT_STAGE_SECONDS.observe(seconds, stage)
+        CHAT_REQUEST_SECONDS.observe(budget.elapsed_ms() / 1000, path)
+        CHAT_RESPONSES.inc(path)
+        
+        metadata = {"path": path, **budget.report()}
+        if include_timings:
+            metadata["timings_ms"] = timings.report()
         
         return {
             "session_id": session_id,
             "response": response,
             "suggestions": suggestions,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": datetime.now().isoformat(),
+            "metadata": metadata
         }
     
-    def _generate_suggestions(self, user_message: str, bot_response: str) -> List[str]:
+    def _generate_suggestions(self, user_message: str, bot_response: str,
+                              analysis: Optional[QueryAnalysis] = None) -> List[str]:
         """Generate follow-up suggestions"""
-        suggestions = []
-        
-        # Medical condition specific suggestions
-        medical_info = self.chatbot_model.find_relevant_medical_info(user_message)
-        if medical_info:
-            condition = medical_info[0]["condition"].replace("_", " ")
-            suggestions.extend([
-                f"What causes {condition}?",
-                f"How is {condition} treated?",
-                f"When should I see a doctor for {condition}?",
-                "What are the warning signs I should watch for?"
-            ])
-        
-        # General medical suggestions
-        if any(word in user_message.lower() for word in ["pain", "hurt", "ache"]):
-            suggestions.extend([
-                "How severe is the pain on a scale of 1-10?",
-                "Where exactly is the pain located?",
-                "When did the pain start?",
-                "What makes the pain better or worse?"
-            ])
-        
-        # Symptom-specific suggestions
-        if "nausea" in user_message.lower():
-            suggestions.append("Are you also experiencing vomiting?")
-        
-        if "fever" in user_message.lower():
-            suggestions.append("What is your current temperature?")
-        
-        return suggestions[:4]  # Return max 4 suggestions
+        if analysis is None:
+            analysis = self.chatbot_model.analyze_query(user_message)
+        
+        # Condition questions are compiled with the knowledge; symptom follow-ups are fixed tables
+        medical_info = analysis.medical_info
+        template = medical_info[0].get("template") if medical_info else None
+        if medical_info and template is None:
+            template = compile_condition(medical_info[0]["condition"], medical_info[0]["info"])
+        return build_suggestions(template, analysis.keywords)
     
     def get_session_history(self, session_id: str) -> List[Dict]:
         """Get chat history for session"""
-        if session_id in self.active_sessions:
-            return self.active_sessions[session_id]["messages"]
-        return []
\ No newline at end of file
+        return self.active_sessions.history(session_id)
+    
+    def get_history_page(self, session_id: str, since: int = 0,
+                         limit: Optional[int] = None) -> Tuple[List[str], int, bool]:
+        """Serialized messages after the `since` cursor, with the next cursor and whether more follow"""
+        return self.active_sessions.history_page(session_id, since, limit or settings.HISTORY_PAGE_SIZE)
+    
+    def iter_history(self, session_id: str, since: int = 0) -> Iterator[str]:
+        """Yield every serialized message after the `since` cursor, one page at a time"""
+        has_more = True
+        while has_more:
+            records, since, has_more = self.get_history_page(session_id, since)
+            yield from records
+    
+    def warm_up(self):
+        """Load the embedder first, then DialoGPT unless it is left to load on first use"""
+        self.chatbot_model.load_embedder()
+        if settings.WARMUP_CONVERSATIONAL:
+            self.chatbot_model.load_conversational_model()
+    
+    def shutdown(self):
+        """Release the inference worker pool"""
+        self.executor.shutdown()
+    
+    def get_stats(self) -> Dict:
+        """Runtime statistics for the chat service"""
+        return {
+            "sessions": self.active_sessions.stats(),
+            "model_state": dict(self.chatbot_model.model_state),
+            "executor": self.executor.stats(),
+            "admission": self.admission.stats(),
+            "response_cache": self.response_cache.stats(),
+            "model": self.chatbot_model.get_stats()
+        }
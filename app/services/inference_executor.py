@@ -0,0 +1,110 @@
+import asyncio
+import functools
+import multiprocessing
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from models.chatbot_model import MedicalChatbotModel, QueryAnalysis
+from services.admission import PrioritySemaphore
+
+# Model owned by each process-pool worker
+_worker_model: Optional[MedicalChatbotModel] = None
+
+
+def run_turn(model: MedicalChatbotModel, message: str, conversation_history: List[str],
+             analysis: QueryAnalysis) -> Tuple[str, QueryAnalysis]:
+    """Retrieve and generate the response for one analyzed chat turn"""
+    model.retrieve(analysis)
+    response = model.generate_response(message, conversation_history, analysis)
+    return response, analysis
+
+
+def init_worker_model() -> None:
+    """Load the models once in each process-pool worker"""
+    global _worker_model
+    _worker_model = MedicalChatbotModel()
+    _worker_model.load_models()
+
+
+def run_worker_turn(message: str, conversation_history: List[str],
+                    analysis: QueryAnalysis) -> Tuple[str, QueryAnalysis]:
+    """Process-pool entry point for a chat turn"""
+    # Workers hold their own knowledge snapshot; pick up knowledge file changes here
+    _worker_model.reload_if_changed()
+    return run_turn(_worker_model, message, conversation_history, analysis)
+
+
+class InferenceExecutor:
+    """Runs blocking model calls off the asyncio event loop"""
+
+    def __init__(self, mode: str = "thread", max_workers: int = 4, max_in_flight: int = 8):
+        if mode == "process":
+            # Spawned workers do not inherit torch's thread pools from the parent
+            self._executor: Executor = ProcessPoolExecutor(
+                max_workers=max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=init_worker_model
+            )
+        elif mode == "thread":
+            self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="inference")
+        else:
+            raise ValueError(f"Unknown inference mode '{mode}'. Choose 'thread' or 'process'")
+
+        self.mode = mode
+        self.max_workers = max_workers
+        self.max_in_flight = max(1, max_in_flight)
+        self._semaphore: Optional[PrioritySemaphore] = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._waiting = 0
+        self._completed = 0
+
+    def _get_semaphore(self) -> PrioritySemaphore:
+        # Created on first use so it belongs to the server's running loop
+        if self._semaphore is None:
+            self._semaphore = PrioritySemaphore(self.max_in_flight)
+        return self._semaphore
+
+    async def run(self, fn: Callable, *args, priority: int = 0, **kwargs) -> Any:
+        """Run fn in the pool once an in-flight slot is free, lower priority numbers first"""
+        semaphore = self._get_semaphore()
+        with self._lock:
+            self._waiting += 1
+        try:
+            await semaphore.acquire(priority)
+        finally:
+            with self._lock:
+                self._waiting -= 1
+
+        with self._lock:
+            self._in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, functools.partial(fn, *args, **kwargs))
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+                self._completed += 1
+            semaphore.release()
+
+    async def run_turn(self, model: MedicalChatbotModel, message: str, conversation_history: List[str],
+                       analysis: QueryAnalysis, priority: int = 0) -> Tuple[str, QueryAnalysis]:
+        """Run a chat turn on the local model or on a process-pool worker"""
+        if self.mode == "process":
+            return await self.run(run_worker_turn, message, conversation_history, analysis, priority=priority)
+        return await self.run(run_turn, model, message, conversation_history, analysis, priority=priority)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "mode": self.mode,
+                "max_workers": self.max_workers,
+                "max_in_flight": self.max_in_flight,
+                "in_flight": self._in_flight,
+                "waiting": self._waiting,
+                "completed": self._completed
+            }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,327 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Deque, Dict, List, Optional, Tuple
+
+# Compact message record: (seq, role, content, JSON serialized at append time)
+MessageRecord = Tuple[int, str, str, str]
+
+# (serialized records oldest first, cursor for the next page, whether more records follow)
+HistoryPage = Tuple[List[str], int, bool]
+
+
+def _serialize_message(seq: int, role: str, content: str, timestamp: float) -> str:
+    return json.dumps({
+        "seq": seq,
+        "role": role,
+        "content": content,
+        "timestamp": datetime.fromtimestamp(timestamp).isoformat()
+    })
+
+
+def _page(records: List[MessageRecord], since: int, limit: int) -> HistoryPage:
+    """Page of records newer than `since` from a list sorted by seq"""
+    page = records[:limit]
+    next_since = page[-1][0] if page else since
+    return [record[3] for record in page], next_since, len(records) > limit
+
+
+class SessionStore:
+    """Interface for chat session storage"""
+
+    # Whether calls do blocking I/O and should be kept off the event loop
+    blocking = False
+
+    def create(self, session_id: str) -> None:
+        raise NotImplementedError
+
+    def __contains__(self, session_id: str) -> bool:
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def append(self, session_id: str, role: str, content: str) -> None:
+        """Add a message, creating the session if it has been evicted"""
+        raise NotImplementedError
+
+    def recent_contents(self, session_id: str, count: int) -> List[str]:
+        """Contents of the last `count` messages, oldest first"""
+        raise NotImplementedError
+
+    def history(self, session_id: str) -> List[Dict]:
+        """Every stored message, oldest first"""
+        messages, since, has_more = [], 0, True
+        while has_more:
+            records, since, has_more = self.history_page(session_id, since)
+            messages.extend(json.loads(record) for record in records)
+        return messages
+
+    def history_page(self, session_id: str, since: int = 0, limit: int = 100) -> HistoryPage:
+        """Up to `limit` serialized messages with a sequence number above `since`"""
+        raise NotImplementedError
+
+    def stats(self) -> Dict:
+        return {"backend": type(self).__name__, "sessions": len(self)}
+
+
+class _Session:
+    __slots__ = ("created_at", "last_access", "messages", "last_seq")
+
+    def __init__(self, now: float, max_messages: int):
+        self.created_at = now
+        self.last_access = now
+        self.messages: Deque[MessageRecord] = deque(maxlen=max_messages)
+        self.last_seq = 0
+
+
+class InMemorySessionStore(SessionStore):
+    """Per-process session store with LRU and TTL eviction"""
+
+    def __init__(self, max_sessions: int = 10000, ttl_seconds: float = 3600, max_messages: int = 100):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.max_messages = max_messages
+        self._sessions: "OrderedDict[str, _Session]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._evicted = 0
+
+    def _evict(self, now: float) -> None:
+        # Sessions are kept in access order, so expired ones sit at the front
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if len(self._sessions) <= self.max_sessions and now - session.last_access <= self.ttl_seconds:
+                break
+            del self._sessions[session_id]
+            self._evicted += 1
+
+    def _get(self, session_id: str, now: float) -> Optional[_Session]:
+        session = self._sessions.get(session_id)
+        if session is None:
+            return None
+        if now - session.last_access > self.ttl_seconds:
+            del self._sessions[session_id]
+            self._evicted += 1
+            return None
+        session.last_access = now
+        self._sessions.move_to_end(session_id)
+        return session
+
+    def create(self, session_id: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._sessions[session_id] = _Session(now, self.max_messages)
+            self._sessions.move_to_end(session_id)
+            self._evict(now)
+
+    def __contains__(self, session_id: str) -> bool:
+        with self._lock:
+            return self._get(session_id, time.time()) is not None
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def append(self, session_id: str, role: str, content: str) -> None:
+        now = time.time()
+        with self._lock:
+            session = self._get(session_id, now)
+            if session is None:
+                session = self._sessions[session_id] = _Session(now, self.max_messages)
+                self._evict(now)
+            session.last_seq += 1
+            seq = session.last_seq
+            session.messages.append((seq, role, content, _serialize_message(seq, role, content, now)))
+
+    def recent_contents(self, session_id: str, count: int) -> List[str]:
+        with self._lock:
+            session = self._get(session_id, time.time())
+            if session is None:
+                return []
+            messages = list(session.messages)[-count:]
+        return [content for _, _, content, _ in messages]
+
+    def history_page(self, session_id: str, since: int = 0, limit: int = 100) -> HistoryPage:
+        with self._lock:
+            session = self._get(session_id, time.time())
+            if session is None:
+                return [], since, False
+            # Walk back from the newest message so a poll costs the number of new turns
+            records = []
+            for record in reversed(session.messages):
+                if record[0] <= since:
+                    break
+                records.append(record)
+        records.reverse()
+        return _page(records, since, limit)
+
+    def stats(self) -> Dict:
+        stats = super().stats()
+        stats["evicted"] = self._evicted
+        return stats
+
+
+class SQLiteSessionStore(SessionStore):
+    """Session store shared by all worker processes through a SQLite file in WAL mode"""
+
+    blocking = True
+
+    # Run the TTL/LRU sweep at most this often
+    SWEEP_INTERVAL_SECONDS = 30.0
+
+    def __init__(self, path: str, max_sessions: int = 10000, ttl_seconds: float = 3600,
+                 max_messages: int = 100):
+        self.path = path
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.max_messages = max_messages
+        self._local = threading.local()
+        self._last_sweep = 0.0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                id TEXT PRIMARY KEY,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS sessions_last_access ON sessions (last_access);
+            CREATE TABLE IF NOT EXISTS messages (
+                session_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                role TEXT NOT NULL,
+                content TEXT NOT NULL,
+                ts REAL NOT NULL,
+                record TEXT,
+                PRIMARY KEY (session_id, seq)
+            ) WITHOUT ROWID;
+        """)
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(messages)")]
+        if "record" not in columns:
+            # Databases created before records were serialized at append time
+            conn.execute("ALTER TABLE messages ADD COLUMN record TEXT")
+
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared across threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10.0, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _sweep(self, conn: sqlite3.Connection, now: float) -> None:
+        if now - self._last_sweep < self.SWEEP_INTERVAL_SECONDS:
+            return
+        self._last_sweep = now
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM sessions WHERE last_access < ?", (now - self.ttl_seconds,))
+            conn.execute(
+                "DELETE FROM sessions WHERE id IN ("
+                " SELECT id FROM sessions ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_sessions,)
+            )
+            conn.execute("DELETE FROM messages WHERE session_id NOT IN (SELECT id FROM sessions)")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def create(self, session_id: str) -> None:
+        now = time.time()
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO sessions (id, created_at, last_access) VALUES (?, ?, ?)",
+            (session_id, now, now)
+        )
+        self._sweep(conn, now)
+
+    def _touch(self, conn: sqlite3.Connection, session_id: str, now: float) -> bool:
+        cursor = conn.execute(
+            "UPDATE sessions SET last_access = ? WHERE id = ? AND last_access >= ?",
+            (now, session_id, now - self.ttl_seconds)
+        )
+        return cursor.rowcount > 0
+
+    def __contains__(self, session_id: str) -> bool:
+        now = time.time()
+        row = self._conn().execute(
+            "SELECT 1 FROM sessions WHERE id = ? AND last_access >= ?",
+            (session_id, now - self.ttl_seconds)
+        ).fetchone()
+        return row is not None
+
+    def __len__(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def append(self, session_id: str, role: str, content: str) -> None:
+        now = time.time()
+        conn = self._conn()
+        # IMMEDIATE takes the write lock up front so sequence numbers never collide
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if not self._touch(conn, session_id, now):
+                conn.execute(
+                    "INSERT OR REPLACE INTO sessions (id, created_at, last_access) VALUES (?, ?, ?)",
+                    (session_id, now, now)
+                )
+                conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+            seq = conn.execute(
+                "SELECT COALESCE(MAX(seq), 0) + 1 FROM messages WHERE session_id = ?", (session_id,)
+            ).fetchone()[0]
+            conn.execute(
+                "INSERT INTO messages (session_id, seq, role, content, ts, record) VALUES (?, ?, ?, ?, ?, ?)",
+                (session_id, seq, role, content, now, _serialize_message(seq, role, content, now))
+            )
+            conn.execute(
+                "DELETE FROM messages WHERE session_id = ? AND seq <= ?",
+                (session_id, seq - self.max_messages)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def recent_contents(self, session_id: str, count: int) -> List[str]:
+        if session_id not in self:
+            return []
+        rows = self._conn().execute(
+            "SELECT content FROM messages WHERE session_id = ? ORDER BY seq DESC LIMIT ?",
+            (session_id, count)
+        ).fetchall()
+        return [content for content, in reversed(rows)]
+
+    def history_page(self, session_id: str, since: int = 0, limit: int = 100) -> HistoryPage:
+        if session_id not in self:
+            return [], since, False
+        # One extra row tells whether another page follows
+        rows = self._conn().execute(
+            "SELECT seq, role, content, ts, record FROM messages"
+            " WHERE session_id = ? AND seq > ? ORDER BY seq LIMIT ?",
+            (session_id, since, limit + 1)
+        ).fetchall()
+        records = [
+            (seq, role, content, record or _serialize_message(seq, role, content, ts))
+            for seq, role, content, ts, record in rows
+        ]
+        return _page(records, since, limit)
+
+
+def create_session_store(backend: str, db_path: str, max_sessions: int, ttl_seconds: float,
+                         max_messages: int) -> SessionStore:
+    """Build the configured session store backend"""
+    if backend == "memory":
+        return InMemorySessionStore(max_sessions, ttl_seconds, max_messages)
+    if backend == "sqlite":
+        return SQLiteSessionStore(db_path, max_sessions, ttl_seconds, max_messages)
+    raise ValueError(f"Unknown session backend '{backend}'. Choose 'memory' or 'sqlite'")
@@ -0,0 +1,87 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+
+NO_MATCH_RESPONSE = "I don't have specific information about that in my abdominal pain knowledge base. Could you provide more details about your symptoms?"
+
+SEVERE_LEVELS = frozenset(["severe", "moderate to severe"])
+SEVERE_NOTICE = ("\n⚠️ **Important:** This condition may require medical attention. "
+                 "Please consult a healthcare provider for proper diagnosis and treatment.\n")
+URGENT_BANNER = ("\n🚨 **Urgent:** Your symptoms may indicate a serious condition. "
+                 "Please seek immediate medical attention or call emergency services.\n")
+DISCLAIMER = "\n*This information is for educational purposes only and should not replace professional medical advice.*"
+
+# (symptom keywords, follow-up questions) in the order suggestions are offered
+SYMPTOM_SUGGESTIONS: Tuple[Tuple[frozenset, Tuple[str, ...]], ...] = (
+    (frozenset(["pain", "hurt", "ache"]), (
+        "How severe is the pain on a scale of 1-10?",
+        "Where exactly is the pain located?",
+        "When did the pain start?",
+        "What makes the pain better or worse?"
+    )),
+    (frozenset(["nausea"]), ("Are you also experiencing vomiting?",)),
+    (frozenset(["fever"]), ("What is your current temperature?",)),
+)
+
+MAX_SUGGESTIONS = 4
+
+
+class CompiledCondition:
+    """Pre-rendered answer body and follow-up questions for one condition"""
+
+    __slots__ = ("condition", "body", "urgent_body", "suggestions")
+
+    def __init__(self, condition: str, body: str, suggestions: Tuple[str, ...]):
+        self.condition = condition
+        self.body = body + DISCLAIMER
+        self.urgent_body = body + URGENT_BANNER + DISCLAIMER
+        self.suggestions = suggestions
+
+    def render(self, urgent: bool = False) -> str:
+        return self.urgent_body if urgent else self.body
+
+
+def compile_condition(condition: str, info: Dict) -> CompiledCondition:
+    """Render everything in a condition's answer that does not depend on the request"""
+    name = condition.replace("_", " ")
+    parts = [
+        f"Based on your symptoms, you might be experiencing {name.title()}.\n\n",
+        f"**Description:** {info['description']}\n\n",
+        "**Common symptoms include:**\n"
+    ]
+    parts.extend(f"• {symptom.title()}\n" for symptom in info["symptoms"][:4])  # Show top 4 symptoms
+    parts.extend([
+        "\n**Typical characteristics:**\n",
+        f"• Location: {info['location']}\n",
+        f"• Severity: {info['severity']}\n",
+        f"• Duration: {info['duration']}\n"
+    ])
+    if info["severity"] in SEVERE_LEVELS:
+        parts.append(SEVERE_NOTICE)
+
+    suggestions = (
+        f"What causes {name}?",
+        f"How is {name} treated?",
+        f"When should I see a doctor for {name}?",
+        "What are the warning signs I should watch for?"
+    )
+    return CompiledCondition(condition, "".join(parts), suggestions)
+
+
+def compile_templates(conditions: Dict[str, Dict]) -> Dict[str, CompiledCondition]:
+    """Compile every condition of a knowledge base once, at load time"""
+    return {condition: compile_condition(condition, info) for condition, info in conditions.items()}
+
+
+def build_suggestions(template: Optional[CompiledCondition], keywords: Iterable[str],
+                      limit: int = MAX_SUGGESTIONS) -> List[str]:
+    """Condition questions first, then symptom follow-ups, stopping at `limit`"""
+    suggestions = list(template.suggestions[:limit]) if template is not None else []
+    if len(suggestions) >= limit:
+        return suggestions
+
+    keywords = set(keywords)
+    for triggers, questions in SYMPTOM_SUGGESTIONS:
+        if triggers & keywords:
+            suggestions.extend(questions[:limit - len(suggestions)])
+            if len(suggestions) >= limit:
+                break
+    return suggestions
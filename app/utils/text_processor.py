@@ -0,0 +1,132 @@
+import re
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Unicode word characters, so non-Latin and accented text keeps its words
+_TOKEN_RE = re.compile(r"[\w']+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens; phrase matching works on whole tokens only"""
+    return _TOKEN_RE.findall(text.lower())
+
+
+class KeywordMatcher:
+    """Word-boundary aware Aho-Corasick automaton over phrase tokens
+
+    Every phrase is registered under a category. A single pass over the
+    message tokens returns every phrase hit, so the cost depends on the
+    message length rather than on how many phrases are registered.
+    """
+
+    def __init__(self):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._phrases: List[List[Tuple[str, str]]] = [[]]
+        self._outputs: List[List[Tuple[str, str]]] = [[]]
+        self._built = False
+
+    def add(self, phrase: str, category: str, value: Optional[str] = None) -> None:
+        """Register a phrase; hits report `value` (defaults to the phrase itself)"""
+        tokens = tokenize(phrase)
+        if not tokens:
+            return
+
+        node = 0
+        for token in tokens:
+            next_node = self._goto[node].get(token)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][token] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._phrases.append([])
+            node = next_node
+
+        self._phrases[node].append((category, value if value is not None else phrase))
+        self._built = False
+
+    def add_all(self, phrases: Iterable[str], category: str) -> None:
+        for phrase in phrases:
+            self.add(phrase, category)
+
+    def build(self) -> "KeywordMatcher":
+        """Compute failure links; called automatically before the first match"""
+        self._outputs = [list(phrases) for phrases in self._phrases]
+        queue = deque()
+        for node in self._goto[0].values():
+            self._fail[node] = 0
+            queue.append(node)
+
+        while queue:
+            node = queue.popleft()
+            for token, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and token not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(token, 0)
+                self._outputs[child] = self._outputs[child] + self._outputs[self._fail[child]]
+
+        self._built = True
+        return self
+
+    def match(self, text: str) -> Dict[str, List[str]]:
+        """Return the distinct hits per category, in order of first appearance"""
+        if not self._built:
+            self.build()
+
+        hits: Dict[str, List[str]] = {}
+        seen = set()
+        node = 0
+        for token in tokenize(text):
+            while node and token not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(token, 0)
+
+            for category, value in self._outputs[node]:
+                if (category, value) not in seen:
+                    seen.add((category, value))
+                    hits.setdefault(category, []).append(value)
+
+        return hits
+
+    @classmethod
+    def from_knowledge(cls, knowledge: Dict) -> "KeywordMatcher":
+        """Build the matcher for intents, warning signs, conditions and keywords in a knowledge base"""
+        matcher = cls()
+        for intent, phrases in knowledge["common_questions"].items():
+            matcher.add_all(phrases, intent)
+        for sign in knowledge["warning_signs"]:
+            for phrase in expand_alternatives(sign):
+                matcher.add(phrase, "warning", sign)
+        matcher.add_all(knowledge["medical_keywords"], "medical")
+        for keyword, variants in knowledge["symptom_keywords"].items():
+            for variant in variants:
+                matcher.add(variant, "symptom", keyword)
+        # Condition names and their symptom phrases report the condition
+        for condition, info in knowledge["conditions"].items():
+            matcher.add(condition.replace("_", " "), "condition", condition)
+            for symptom in info["symptoms"]:
+                matcher.add(symptom, "condition", condition)
+        return matcher.build()
+
+
+def expand_alternatives(phrase: str) -> List[str]:
+    """Spell out a trailing one-word alternative: "blood in vomit or stool" -> "blood in vomit", "blood in stool"
+
+    Other phrases, including "or" clauses of several words, are returned unchanged.
+    """
+    head, sep, alternative = phrase.rpartition(" or ")
+    if not sep or " " in alternative.strip() or " " not in head.strip():
+        return [phrase]
+    prefix = head.rsplit(" ", 1)[0]
+    return [head, f"{prefix} {alternative.strip()}"]
+
+
+def normalize_text(text: str) -> str:
+    """Canonical form of a message for cache keys: lowercase words, no punctuation
+
+    Empty for messages with no word characters at all; callers must not cache on an empty key.
+    """
+    return " ".join(tokenize(text))
@@ -0,0 +1,72 @@
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+
+class LatencyBudget:
+    """Wall-clock budget for one chat turn
+
+    Uses time.monotonic(), which on Linux is system-wide, so a budget
+    started in the API process stays valid inside process-pool workers.
+    """
+
+    def __init__(self, budget_ms: Optional[float]):
+        # None or a non-positive budget means unlimited
+        self.budget_ms = budget_ms if budget_ms and budget_ms > 0 else None
+        self.started = time.monotonic()
+
+    def elapsed_ms(self) -> float:
+        return (time.monotonic() - self.started) * 1000
+
+    def remaining_seconds(self) -> Optional[float]:
+        """Seconds left, or None when unlimited"""
+        if self.budget_ms is None:
+            return None
+        return max(0.0, self.budget_ms / 1000 - (time.monotonic() - self.started))
+
+    @property
+    def expired(self) -> bool:
+        return self.budget_ms is not None and self.elapsed_ms() >= self.budget_ms
+
+    def report(self) -> Dict:
+        elapsed = self.elapsed_ms()
+        return {
+            "budget_ms": self.budget_ms,
+            "elapsed_ms": round(elapsed, 1),
+            "budget_used": round(elapsed / self.budget_ms, 3) if self.budget_ms else None
+        }
+
+
+class StageTimer:
+    """Accumulates the wall time spent in each named stage of a chat turn
+
+    Stages may nest; a stage's time excludes the stages timed inside it,
+    so the recorded stages add up to the instrumented total.
+    """
+
+    def __init__(self):
+        self.stages: Dict[str, float] = {}
+        self._children: List[float] = []
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        self._children.append(0.0)
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            nested = self._children.pop()
+            if self._children:
+                self._children[-1] += elapsed
+            self.stages[name] = self.stages.get(name, 0.0) + elapsed - nested
+
+    def record(self, name: str, seconds: float) -> None:
+        """Add time measured elsewhere, such as a queue wait, to a stage"""
+        if self._children:
+            self._children[-1] += seconds
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def report(self) -> Dict[str, float]:
+        """Milliseconds per stage"""
+        return {name: round(seconds * 1000, 3) for name, seconds in self.stages.items()}
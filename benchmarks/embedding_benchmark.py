@@ -0,0 +1,75 @@
+"""Per-query encode latency and top-k agreement of the embedding backends.
+
+Encodes the fixed agreement queries one at a time, as the chat path does,
+and compares each backend's top-k knowledge matches with fp32 torch.
+
+    python benchmarks/embedding_benchmark.py --backends torch torch_int8 onnx
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+# Add the app directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'app')))
+
+from config import settings
+from models.chatbot_model import MedicalChatbotModel
+from models.embedding_backends import AGREEMENT_QUERIES, EMBEDDERS, create_embedder, topk_agreement
+from models.generation_engine import configure_torch_threads
+
+
+def time_queries(embedder, queries, repeats: int):
+    latencies = []
+    for _ in range(repeats):
+        for query in queries:
+            start = time.perf_counter()
+            embedder.encode([query])
+            latencies.append((time.perf_counter() - start) * 1000)
+    return np.array(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default=settings.EMBEDDING_MODEL)
+    parser.add_argument("--backends", nargs="+", default=list(EMBEDDERS))
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--threads", type=int, default=0, help="intra-op threads (0 = torch default)")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    configure_torch_threads(args.threads, 1)
+    corpus, _ = MedicalChatbotModel()._render_medical_texts()
+    reference = create_embedder("torch", args.model)
+
+    results = []
+    for backend in args.backends:
+        try:
+            embedder = reference if backend == "torch" else \
+                create_embedder(backend, args.model, onnx_dir=settings.EMBEDDING_ONNX_DIR)
+        except ImportError as e:
+            print(f"Skipping {backend}: {e}")
+            continue
+        embedder.encode(AGREEMENT_QUERIES)  # warm up
+        latencies = time_queries(embedder, AGREEMENT_QUERIES, args.repeats)
+        agreement = topk_agreement(reference, embedder, corpus, top_k=args.top_k)
+        results.append({
+            "backend": backend,
+            "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+            "p95_ms": round(float(np.percentile(latencies, 95)), 3),
+            f"agreement@{args.top_k}": round(agreement, 3)
+        })
+        print(f"{backend:>12} p50={results[-1]['p50_ms']:.2f}ms p95={results[-1]['p95_ms']:.2f}ms "
+              f"agreement@{args.top_k}={agreement:.3f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
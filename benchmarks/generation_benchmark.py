@@ -0,0 +1,110 @@
+"""Tokens/sec and output agreement of the CPU generation engine variants.
+
+Runs greedy decoding so the fp32 baseline is deterministic, then compares
+prefix-cache reuse and the dynamic int8 model against it.
+
+    python benchmarks/generation_benchmark.py --threads 4
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+# Add the app directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'app')))
+
+from models.chatbot_model import MEDICAL_CONTEXT
+from models.generation_engine import CPUGenerationEngine, configure_torch_threads
+
+PROMPTS = [
+    "What should I eat when my stomach is upset?",
+    "Is it normal to feel bloated after dinner?",
+    "My belly has been making noises all day",
+    "Can stress cause stomach problems?",
+    "How much water should I drink when I have diarrhea?",
+    "What does it mean if my stomach feels tight?",
+]
+
+
+def load_engine(model_name: str, quantize: bool, reuse_prefix_cache: bool):
+    from transformers import GPT2LMHeadModel, GPT2Tokenizer
+
+    tokenizer = GPT2Tokenizer.from_pretrained(model_name)
+    tokenizer.pad_token = tokenizer.eos_token
+    model = GPT2LMHeadModel.from_pretrained(model_name)
+    return CPUGenerationEngine(model, tokenizer, prefix=MEDICAL_CONTEXT, quantize=quantize,
+                               reuse_prefix_cache=reuse_prefix_cache)
+
+
+def run_engine(engine, max_new_tokens: int, repeats: int):
+    outputs = []
+    new_tokens = 0
+    elapsed = 0.0
+    for _ in range(repeats):
+        outputs = []
+        for prompt in PROMPTS:
+            inputs = engine.encode_prompt(prompt)
+            start = time.perf_counter()
+            output_ids = engine.generate(inputs, max_new_tokens=max_new_tokens, do_sample=False)
+            elapsed += time.perf_counter() - start
+            new_tokens += len(output_ids)
+            outputs.append(output_ids.tolist())
+    return outputs, new_tokens / elapsed
+
+
+def agreement(reference, candidate):
+    """Share of exactly matching outputs and mean matching-prefix fraction"""
+    exact = 0
+    prefix_fractions = []
+    for ref, cand in zip(reference, candidate):
+        exact += ref == cand
+        matched = 0
+        for a, b in zip(ref, cand):
+            if a != b:
+                break
+            matched += 1
+        prefix_fractions.append(matched / max(len(ref), 1))
+    return exact / len(reference), sum(prefix_fractions) / len(prefix_fractions)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default="microsoft/DialoGPT-medium")
+    parser.add_argument("--max-new-tokens", type=int, default=40)
+    parser.add_argument("--repeats", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=0, help="intra-op threads (0 = torch default)")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    configure_torch_threads(args.threads, 1)
+
+    variants = [
+        ("fp32", False, False),
+        ("fp32+prefix_cache", False, True),
+        ("int8+prefix_cache", True, True),
+    ]
+    results = []
+    reference = None
+    for name, quantize, reuse_prefix_cache in variants:
+        engine = load_engine(args.model, quantize, reuse_prefix_cache)
+        outputs, tokens_per_sec = run_engine(engine, args.max_new_tokens, args.repeats)
+        if reference is None:
+            reference = outputs
+        exact, prefix = agreement(reference, outputs)
+        results.append({
+            "variant": name,
+            "tokens_per_sec": round(tokens_per_sec, 2),
+            "exact_match": round(exact, 3),
+            "prefix_agreement": round(prefix, 3)
+        })
+        print(f"{name:>20} {tokens_per_sec:8.2f} tok/s  exact={exact:.2f}  prefix={prefix:.2f}")
+        del engine
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
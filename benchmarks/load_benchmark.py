@@ -0,0 +1,154 @@
+"""End-to-end load generator for the FastAPI app, run in-process on the stub models.
+
+Drives the ASGI app directly (no sockets) with a closed loop of concurrent
+clients sending a mix of greetings, medical questions and open-ended
+messages to /chat, and reports latency percentiles overall and per
+response path.
+
+    python benchmarks/load_benchmark.py --requests 2000 --concurrency 16
+"""
+import argparse
+import asyncio
+import importlib
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import Dict, List, Tuple
+
+# Import main without loading the transformer models at import time
+os.environ["LAZY_MODEL_LOADING"] = "true"
+
+# Add the app directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'app')))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stub_models import install_stub_models, peak_rss_mb, summarize_latencies
+
+MESSAGES = [
+    "hello",
+    "what can you do",
+    "sharp pain in upper right abdomen",
+    "burning stomach pain after eating",
+    "nausea and vomiting with fever",
+    "cramping in my lower belly",
+    "is it normal to feel tired after dinner",
+    "can stress cause problems",
+]
+
+
+async def asgi_request(app, method: str, path: str, body: Dict) -> Tuple[int, Dict]:
+    """Send one JSON request straight to an ASGI app and return (status, JSON body)"""
+    payload = json.dumps(body).encode("utf-8")
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode("utf-8"),
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(payload)).encode())],
+        "client": ("127.0.0.1", 0),
+        "server": ("benchmark", 80),
+    }
+    request_sent = False
+    response_done = asyncio.Event()
+    status = 0
+    chunks: List[bytes] = []
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": payload, "more_body": False}
+        await response_done.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                response_done.set()
+
+    await app(scope, receive, send)
+    return status, json.loads(b"".join(chunks) or b"{}")
+
+
+async def run_load(app, num_requests: int, concurrency: int) -> Dict:
+    latencies: List[float] = []
+    by_path: Dict[str, List[float]] = {}
+    errors = 0
+    counter = iter(range(num_requests))
+
+    async def client():
+        nonlocal errors
+        for i in counter:
+            start = time.perf_counter()
+            status, body = await asgi_request(app, "POST", "/chat", {"message": MESSAGES[i % len(MESSAGES)]})
+            elapsed = (time.perf_counter() - start) * 1000
+            if status != 200:
+                errors += 1
+                continue
+            latencies.append(elapsed)
+            by_path.setdefault(body.get("metadata", {}).get("path", "unknown"), []).append(elapsed)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "requests": num_requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "requests_per_sec": round(len(latencies) / elapsed, 2),
+        "latency": summarize_latencies(latencies) if latencies else {},
+        "latency_by_path": {path: summarize_latencies(values) for path, values in sorted(by_path.items())}
+    }
+
+
+def run(num_requests: int = 1000, concurrency: int = 8, ms_per_token: float = 0.0,
+        response_cache: bool = True) -> Dict:
+    api = importlib.import_module("main")
+
+    with tempfile.TemporaryDirectory() as index_dir:
+        service = api.chat_service
+        install_stub_models(service.chatbot_model, index_dir, ms_per_token)
+        if not response_cache:
+            service.response_cache.max_size = 0
+
+        results = asyncio.run(run_load(api.app, num_requests, concurrency))
+        service.shutdown()
+
+    latency = results["latency"]
+    print(f"{results['requests_per_sec']:.1f} req/s  p50={latency.get('p50_ms', 0):.2f}ms "
+          f"p95={latency.get('p95_ms', 0):.2f}ms p99={latency.get('p99_ms', 0):.2f}ms errors={results['errors']}")
+    results["peak_rss_mb"] = peak_rss_mb()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--ms-per-token", type=float, default=0.0,
+                        help="Simulated decoding cost of the stub generator")
+    parser.add_argument("--no-response-cache", action="store_true")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    results = run(args.requests, args.concurrency, args.ms_per_token, not args.no_response_cache)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
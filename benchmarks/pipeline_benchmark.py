@@ -0,0 +1,89 @@
+"""Microbenchmarks for the per-turn pipeline functions, on the stub models.
+
+Times retrieval, general-question handling, suggestion building and
+medical response templating in isolation, one call at a time.
+
+    python benchmarks/pipeline_benchmark.py --iterations 2000
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+# Add the app directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'app')))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from services.chat_service import ChatService
+from stub_models import install_stub_models, peak_rss_mb, summarize_latencies
+
+QUERIES = [
+    "sharp pain in upper right abdomen",
+    "burning stomach pain after eating",
+    "nausea and vomiting with fever",
+    "appendicitis symptoms",
+    "cramping in my lower belly",
+    "hello",
+    "what can you do",
+    "my stomach feels bloated and tight",
+]
+
+
+def time_calls(fn, args_list, iterations: int):
+    latencies = []
+    for i in range(iterations):
+        args = args_list[i % len(args_list)]
+        start = time.perf_counter()
+        fn(*args)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return summarize_latencies(latencies)
+
+
+def run(iterations: int = 1000) -> dict:
+    with tempfile.TemporaryDirectory() as index_dir:
+        service = ChatService(load_models=False)
+        model = service.chatbot_model
+        install_stub_models(model, index_dir)
+
+        analyses = [model.analyze_query(query) for query in QUERIES]
+        medical = [(a.text, a.medical_info, a) for a in analyses if a.medical_info]
+        responses = [model.generate_response(a.text, [], a) for a in analyses]
+
+        results = {
+            "find_relevant_medical_info": time_calls(
+                model.find_relevant_medical_info, [(query,) for query in QUERIES], iterations
+            ),
+            "_handle_general_questions": time_calls(
+                model._handle_general_questions, [(query.lower(),) for query in QUERIES], iterations
+            ),
+            "_generate_suggestions": time_calls(
+                service._generate_suggestions,
+                [(a.text, response, a) for a, response in zip(analyses, responses)],
+                iterations
+            ),
+            "_generate_medical_response": time_calls(model._generate_medical_response, medical, iterations)
+        }
+        service.shutdown()
+
+    for name, stats in results.items():
+        print(f"{name:>28} p50={stats['p50_ms']:.4f}ms p95={stats['p95_ms']:.4f}ms p99={stats['p99_ms']:.4f}ms")
+    return {"microbenchmarks": results, "peak_rss_mb": peak_rss_mb()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=1000)
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    results = run(args.iterations)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
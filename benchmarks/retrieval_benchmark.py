@@ -0,0 +1,101 @@
+"""Recall@k and latency benchmark for the retrieval backends.
+
+Compares every backend in ``models.retrievers`` against the brute-force
+baseline on a synthetic, clustered corpus shaped like MiniLM embeddings.
+
+    python benchmarks/retrieval_benchmark.py --sizes 1000 10000 50000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+# Add the app directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'app')))
+
+from models.retrievers import create_retriever, recall_at_k
+
+
+def make_corpus(size: int, dimension: int, num_queries: int, seed: int = 0):
+    """Build unit-length document and query vectors grouped around topic centroids"""
+    rng = np.random.RandomState(seed)
+    centroids = rng.randn(max(1, size // 50), dimension)
+    documents = centroids[rng.randint(len(centroids), size=size)] + 0.5 * rng.randn(size, dimension)
+    documents /= np.linalg.norm(documents, axis=1, keepdims=True)
+
+    queries = documents[rng.randint(size, size=num_queries)] + 0.3 * rng.randn(num_queries, dimension)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    return documents.astype(np.float32), queries.astype(np.float32)
+
+
+def time_queries(retriever, queries: np.ndarray, top_k: int):
+    """Run queries one at a time, as the chat path does, and collect latencies"""
+    latencies = []
+    indices = []
+    for query in queries:
+        start = time.perf_counter()
+        _, idx = retriever.search(query[None, :], top_k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        indices.append(idx[0])
+    return np.array(latencies), np.array(indices)
+
+
+def run(sizes, backends, dimension: int, num_queries: int, top_k: int):
+    results = []
+    for size in sizes:
+        documents, queries = make_corpus(size, dimension, num_queries)
+        baseline = create_retriever("brute_force", documents)
+        _, reference = time_queries(baseline, queries, top_k)
+
+        for backend, options in backends:
+            start = time.perf_counter()
+            try:
+                retriever = create_retriever(backend, documents, **options)
+            except ImportError as e:
+                print(f"Skipping {backend}: {e}")
+                continue
+            build_ms = (time.perf_counter() - start) * 1000
+
+            latencies, indices = time_queries(retriever, queries, top_k)
+            label = backend if not options else f"{backend}:{options.get('index_type')}"
+            results.append({
+                "backend": label,
+                "size": size,
+                "build_ms": round(build_ms, 2),
+                "p50_ms": round(float(np.percentile(latencies, 50)), 4),
+                "p95_ms": round(float(np.percentile(latencies, 95)), 4),
+                f"recall@{top_k}": round(recall_at_k(reference, indices), 4)
+            })
+            print(f"{label:>12} n={size:<7} build={build_ms:9.1f}ms "
+                  f"p50={results[-1]['p50_ms']:.3f}ms p95={results[-1]['p95_ms']:.3f}ms "
+                  f"recall@{top_k}={results[-1][f'recall@{top_k}']:.3f}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    backends = [
+        ("brute_force", {}),
+        ("exact", {}),
+        ("faiss", {"index_type": "hnsw"}),
+        ("faiss", {"index_type": "ivf"}),
+    ]
+    results = run(args.sizes, backends, args.dimension, args.queries, args.top_k)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""Deterministic stand-ins for the embedder and DialoGPT, so benchmarks run offline.
+
+The stubs reproduce the interfaces the pipeline calls, not model quality:
+embeddings are hashed bags of words and generation replays a canned reply,
+optionally sleeping per token to mimic decoding cost.
+"""
+import os
+import queue
+import sys
+import threading
+import time
+import zlib
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# Add the app directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'app')))
+
+from config import settings
+from models.embedding_index import EmbeddingIndexStore
+from models.generation_engine import GenerationStream
+from utils.text_processor import tokenize
+
+STUB_REPLY = ("Abdominal pain after meals is often related to digestion. If the pain is severe, "
+              "or comes with fever or vomiting, please see a doctor.")
+
+
+class StubEmbedder:
+    """SentenceTransformer stand-in: unit-length sums of per-token random vectors"""
+
+    def __init__(self, dimension: int = 384):
+        self.dimension = dimension
+        self._token_vectors: Dict[str, np.ndarray] = {}
+
+    def _token_vector(self, token: str) -> np.ndarray:
+        vector = self._token_vectors.get(token)
+        if vector is None:
+            rng = np.random.RandomState(zlib.crc32(token.encode("utf-8")))
+            vector = self._token_vectors[token] = rng.randn(self.dimension).astype(np.float32)
+        return vector
+
+    def encode(self, texts: List[str], **kwargs) -> np.ndarray:
+        embeddings = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in tokenize(text):
+                embeddings[row] += self._token_vector(token)
+            norm = np.linalg.norm(embeddings[row])
+            if norm:
+                embeddings[row] /= norm
+        return embeddings
+
+
+class StubTokenizer:
+    """Word-level tokenizer with a vocabulary that grows as text is encoded"""
+
+    eos_token_id = 0
+
+    def __init__(self):
+        self._ids: Dict[str, int] = {"<eos>": 0}
+        self._words: List[str] = ["<eos>"]
+        self._lock = threading.Lock()
+
+    def encode(self, text: str) -> List[int]:
+        ids = []
+        with self._lock:
+            for word in text.split():
+                if word not in self._ids:
+                    self._ids[word] = len(self._words)
+                    self._words.append(word)
+                ids.append(self._ids[word])
+        return ids
+
+    def decode(self, ids, skip_special_tokens: bool = False) -> str:
+        words = [self._words[i] for i in ids if not (skip_special_tokens and i == self.eos_token_id)]
+        return " ".join(words)
+
+
+class StubTextStream:
+    """Iterator over text pushed from the generating thread, like TextIteratorStreamer"""
+
+    _END = object()
+
+    def __init__(self, timeout: Optional[float] = None):
+        self.timeout = timeout
+        self._queue: "queue.Queue" = queue.Queue()
+
+    def put(self, text: str) -> None:
+        self._queue.put(text)
+
+    def end(self) -> None:
+        self._queue.put(self._END)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        # queue.Empty propagates on timeout, as it does from TextIteratorStreamer
+        text = self._queue.get(timeout=self.timeout)
+        if text is self._END:
+            raise StopIteration
+        return text
+
+
+class StubGenerationEngine:
+    """CPUGenerationEngine stand-in that replays STUB_REPLY"""
+
+    def __init__(self, tokenizer: StubTokenizer, prefix: str, ms_per_token: float = 0.0, reply: str = STUB_REPLY):
+        self.tokenizer = tokenizer
+        self.ms_per_token = ms_per_token
+        self.prefix_ids = tokenizer.encode(prefix)
+        self.reply_ids = tokenizer.encode(reply) + [tokenizer.eos_token_id]
+
+    def encode_text(self, text: str) -> List[int]:
+        return self.tokenizer.encode(text)
+
+    def encode_prompt(self, user_input: str) -> np.ndarray:
+        return self.build_prompt(self.encode_text(user_input))
+
+    def build_prompt(self, user_ids: List[int], context_ids: List[int] = ()) -> np.ndarray:
+        return np.array([self.prefix_ids + list(context_ids) + user_ids])
+
+    def generate(self, input_ids, max_new_tokens: int = 100, do_sample: bool = True,
+                 temperature: float = 0.7, max_time: Optional[float] = None, **generate_kwargs) -> List[int]:
+        started = time.monotonic()
+        output_ids = []
+        for token_id in self.reply_ids[:max_new_tokens]:
+            if max_time is not None and time.monotonic() - started >= max_time:
+                break
+            if self.ms_per_token:
+                time.sleep(self.ms_per_token / 1000)
+            output_ids.append(token_id)
+        return output_ids
+
+    def stream(self, input_ids, max_new_tokens: int = 100, do_sample: bool = True,
+               temperature: float = 0.7, timeout: Optional[float] = None) -> GenerationStream:
+        # Same contract as TextIteratorStreamer: decoded words, then the end marker
+        chunks = StubTextStream(timeout)
+
+        def generate(abort: threading.Event) -> List[int]:
+            output_ids = []
+            for token_id in self.reply_ids[:max_new_tokens]:
+                if abort.is_set():
+                    break
+                if self.ms_per_token:
+                    time.sleep(self.ms_per_token / 1000)
+                output_ids.append(token_id)
+                if token_id != self.tokenizer.eos_token_id:
+                    chunks.put(" " + self.tokenizer.decode([token_id]))
+            chunks.end()
+            return output_ids
+
+        return GenerationStream(generate, chunks, chunks.end)
+
+    def generate_batch(self, prompts: List[List[int]], max_new_tokens: List[int], do_sample: bool = True,
+                       temperature: float = 0.7, max_time: Optional[float] = None) -> List[List[int]]:
+        # One decode loop serves the whole batch, as in the real engine
+        output_ids = self.generate(None, max(max_new_tokens), max_time=max_time)
+        return [output_ids[:limit] for limit in max_new_tokens]
+
+    def info(self) -> dict:
+        return {"stub": True, "ms_per_token": self.ms_per_token}
+
+
+def install_stub_models(model, index_dir: str, ms_per_token: float = 0.0) -> None:
+    """Load a MedicalChatbotModel with the stubs instead of the transformer models"""
+    from models.chatbot_model import MEDICAL_CONTEXT
+
+    model.embedding_model = StubEmbedder(settings.EMBEDDING_DIMENSION)
+    model.embedding_model_name = "stub-hash-embedder"
+    model.embedding_backend = "stub"
+    model.index_store = EmbeddingIndexStore(index_dir, settings.EMBEDDING_DIMENSION)
+    model._generate_medical_embeddings()
+
+    model.tokenizer = StubTokenizer()
+    model.generation_engine = StubGenerationEngine(model.tokenizer, MEDICAL_CONTEXT, ms_per_token)
+    model.model = model.generation_engine
+    model.model_state.update(embedder="ready", conversational="ready")
+
+
+def summarize_latencies(latencies_ms: List[float]) -> Dict[str, float]:
+    """p50/p95/p99 and mean of a list of latencies in milliseconds"""
+    latencies = np.asarray(latencies_ms)
+    return {
+        "count": int(latencies.size),
+        "mean_ms": round(float(latencies.mean()), 4),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 4),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 4),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 4)
+    }
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process"""
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024, 1)
@@ -0,0 +1,100 @@
+"""Run the offline benchmark suite and record or compare a JSON baseline.
+
+Runs the pipeline microbenchmarks and the in-process load test on the stub
+models, tags the results with the current git commit, and optionally
+compares them against an earlier baseline, flagging latency and
+throughput regressions beyond a tolerance.
+
+    python benchmarks/suite.py --output baseline.json
+    python benchmarks/suite.py --compare baseline.json --tolerance 0.15
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import load_benchmark
+import pipeline_benchmark
+from stub_models import peak_rss_mb
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(baseline: Dict, current: Dict, tolerance: float) -> List[str]:
+    """Describe every tracked metric that got worse by more than `tolerance`"""
+    regressions = []
+
+    def check(name: str, old: float, new: float, higher_is_better: bool = False):
+        if not old:
+            return
+        change = (new - old) / old
+        worse = -change if higher_is_better else change
+        if worse > tolerance:
+            regressions.append(f"{name}: {old} -> {new} ({change:+.1%})")
+
+    for fn, stats in current["microbenchmarks"].items():
+        old = baseline.get("microbenchmarks", {}).get(fn)
+        if old:
+            for key in ("p50_ms", "p95_ms", "p99_ms"):
+                check(f"{fn} {key}", old[key], stats[key])
+
+    old_load, load = baseline.get("load", {}), current["load"]
+    if old_load:
+        check("load requests_per_sec", old_load["requests_per_sec"], load["requests_per_sec"], True)
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            check(f"load {key}", old_load["latency"].get(key), load["latency"].get(key))
+    check("peak_rss_mb", baseline.get("peak_rss_mb"), current["peak_rss_mb"])
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=1000, help="Calls per microbenchmark")
+    parser.add_argument("--requests", type=int, default=1000, help="Requests in the load test")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--ms-per-token", type=float, default=0.0,
+                        help="Simulated decoding cost of the stub generator")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    parser.add_argument("--compare", help="Baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+                        help="Allowed relative slowdown before a metric counts as a regression")
+    args = parser.parse_args()
+
+    results = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "microbenchmarks": pipeline_benchmark.run(args.iterations)["microbenchmarks"],
+        "load": load_benchmark.run(args.requests, args.concurrency, args.ms_per_token)
+    }
+    results["load"].pop("peak_rss_mb", None)
+    results["peak_rss_mb"] = peak_rss_mb()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, results, args.tolerance)
+        print(f"Compared with {baseline.get('commit', 'baseline')}: {len(regressions)} regression(s)")
+        for line in regressions:
+            print(f"  {line}")
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
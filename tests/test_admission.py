@@ -0,0 +1,122 @@
+import sys
+import os
+import asyncio
+
+import pytest
+
+# Add the app directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'app')))
+
+from data.medical_data import ABDOMINAL_PAIN_KNOWLEDGE
+from services.admission import AdmissionController, AdmissionRejected, PrioritySemaphore
+from utils.text_processor import KeywordMatcher
+
+
+class TestAdmissionController:
+    """Test suite for priority-aware admission control"""
+
+    def test_classify_real_messages(self):
+        """Test that messages are classified from the knowledge base's own keyword matcher"""
+        matcher = KeywordMatcher.from_knowledge(ABDOMINAL_PAIN_KNOWLEDGE)
+        expected = {
+            "blood in vomit": "urgent",
+            "I have chest pain and high fever": "urgent",
+            "blood in urine": "medical",
+            "gastritis": "medical",
+            "appendicitis?": "medical",
+            "vomiting and diarrhea": "medical",
+            "gallstones after fatty meals": "medical",
+            "my stomach hurts": "medical",
+            "tell me about your weekend": "generative",
+        }
+        for message, request_class in expected.items():
+            assert AdmissionController.classify(matcher.match(message)) == request_class, message
+
+    def test_full_queue_is_rejected_with_retry_after(self):
+        """Test that a class sheds load once its slots and queue are taken, leaving other classes alone"""
+        controller = AdmissionController({"generative": (1, 1), "urgent": (1, 0)})
+
+        async def scenario():
+            release = asyncio.Event()
+
+            async def hold():
+                async with controller.admit("generative"):
+                    await release.wait()
+
+            holder = asyncio.ensure_future(hold())
+            queued = asyncio.ensure_future(hold())
+            await asyncio.sleep(0)
+
+            with pytest.raises(AdmissionRejected) as rejected:
+                async with controller.admit("generative"):
+                    pass
+            assert rejected.value.retry_after >= 1
+
+            # Urgent turns have their own slots
+            async with controller.admit("urgent"):
+                pass
+
+            release.set()
+            await asyncio.gather(holder, queued)
+
+        asyncio.run(scenario())
+        stats = controller.stats()["classes"]
+        assert stats["generative"]["admitted"] == 2
+        assert stats["generative"]["rejected"] == 1
+        assert stats["urgent"]["admitted"] == 1
+
+    def test_queue_timeout_sheds_waiting_turn(self):
+        """Test that a turn waiting longer than the queue timeout is rejected and frees its queue place"""
+        controller = AdmissionController({"medical": (1, 4)}, queue_timeout=0.01)
+
+        async def scenario():
+            async with controller.admit("medical"):
+                with pytest.raises(AdmissionRejected):
+                    async with controller.admit("medical"):
+                        pass
+
+        asyncio.run(scenario())
+        assert controller.stats()["classes"]["medical"]["waiting"] == 0
+
+    def test_wait_is_capped_by_remaining_budget(self):
+        """Test that a turn is shed once its latency budget runs out, even within the queue timeout"""
+        controller = AdmissionController({"medical": (1, 4)}, queue_timeout=10.0)
+
+        async def scenario():
+            async with controller.admit("medical"):
+                with pytest.raises(AdmissionRejected):
+                    async with controller.admit("medical", max_wait=0.01):
+                        pass
+                # No budget left: rejected without queueing
+                with pytest.raises(AdmissionRejected):
+                    async with controller.admit("medical", max_wait=0.0):
+                        pass
+
+        asyncio.run(scenario())
+        assert controller.stats()["classes"]["medical"]["rejected"] == 2
+
+
+class TestPrioritySemaphore:
+    """Test suite for the priority-ordered in-flight limit"""
+
+    def test_lower_priority_number_is_woken_first(self):
+        """Test that waiters are served by priority, then in arrival order"""
+        order = []
+
+        async def scenario():
+            semaphore = PrioritySemaphore(1)
+            await semaphore.acquire()
+
+            async def waiter(name, priority):
+                await semaphore.acquire(priority)
+                order.append(name)
+                semaphore.release()
+
+            tasks = [asyncio.ensure_future(waiter(name, priority))
+                     for name, priority in (("generative", 2), ("medical", 1), ("urgent", 0), ("urgent-2", 0))]
+            await asyncio.sleep(0)
+            semaphore.release()
+            await asyncio.gather(*tasks)
+
+        asyncio.run(scenario())
+        assert order == ["urgent", "urgent-2", "medical", "generative"]
@@ -0,0 +1,65 @@
+import sys
+import os
+import asyncio
+import tempfile
+import threading
+
+# Add the app and benchmarks directories to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'app')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'benchmarks')))
+
+from services.chat_service import ChatService
+from services.session_store import SQLiteSessionStore
+from stub_models import install_stub_models
+
+
+class TestAsyncChat:
+    """Test suite for chat turns served from the event loop on the stub models"""
+    
+    def setup_method(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.chat_service = ChatService(load_models=False)
+        install_stub_models(self.chat_service.chatbot_model, os.path.join(self.tmp.name, "index"))
+    
+    def teardown_method(self):
+        self.chat_service.shutdown()
+        self.tmp.cleanup()
+    
+    def test_blocking_session_store_stays_off_the_loop(self):
+        """Test that SQLite session writes run outside the event loop thread"""
+        store = SQLiteSessionStore(os.path.join(self.tmp.name, "sessions.db"))
+        self.chat_service.active_sessions = store
+        append_threads = []
+        original_append = store.append
+        
+        def append(*args):
+            append_threads.append(threading.current_thread())
+            return original_append(*args)
+        
+        store.append = append
+        
+        async def scenario():
+            loop_thread = threading.current_thread()
+            for message in ("hello", "sharp pain in upper right abdomen", "hello"):
+                await self.chat_service.process_message_async(None, message)
+            return loop_thread
+        
+        loop_thread = asyncio.run(scenario())
+        assert len(append_threads) == 6
+        assert loop_thread not in append_threads
+    
+    def test_fallback_does_not_wait_for_dialogpt_load(self):
+        """Test that a conversational turn during the DialoGPT warm-up falls back instead of blocking"""
+        model = self.chat_service.chatbot_model
+        model.model_state["conversational"] = "loading"
+        results = []
+        turn = threading.Thread(target=lambda: results.append(
+            self.chat_service.process_message(None, "tell me about your weekend", latency_budget_ms=60000)
+        ), daemon=True)
+        # A background load holds the lock for its whole duration
+        with model._conversational_lock:
+            turn.start()
+            turn.join(timeout=5)
+        
+        assert results, "turn blocked on the DialoGPT load"
+        assert results[0]["metadata"]["path"] in ("retrieval_fallback", "template_fallback")
@@ -0,0 +1,82 @@
+import sys
+import os
+import tempfile
+
+# Add the app and benchmarks directories to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'app')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'benchmarks')))
+
+from services.chat_service import ChatService
+from stub_models import install_stub_models
+
+MESSAGES = [
+    "hello",
+    "sharp pain in upper right abdomen",
+    "burning stomach pain after eating",
+    "my belly feels strange",
+]
+
+
+class TestBatchChat:
+    """Test suite for bulk message processing on the stub models"""
+    
+    def setup_method(self):
+        self.index_dir = tempfile.TemporaryDirectory()
+        self.chat_service = ChatService(load_models=False)
+        install_stub_models(self.chat_service.chatbot_model, self.index_dir.name)
+    
+    def teardown_method(self):
+        self.chat_service.shutdown()
+        self.index_dir.cleanup()
+    
+    def test_batch_matches_single_turns(self):
+        """Test that batched retrieval picks the same conditions as one-at-a-time turns"""
+        model = self.chat_service.chatbot_model
+        single = [model.analyze_query(message) for message in MESSAGES]
+        batched = [model.analyze_query(message, retrieve=False) for message in MESSAGES]
+        model.retrieve_batch(batched)
+        
+        for one, many in zip(single, batched):
+            assert [r["condition"] for r in one.medical_info] == [r["condition"] for r in many.medical_info]
+    
+    def test_results_in_input_order(self):
+        """Test that results come back in order and share sessions across repeated ids"""
+        session_id = self.chat_service.create_session()
+        items = [(session_id, message) for message in MESSAGES] + [(None, "hello")]
+        results = self.chat_service.process_batch(items)
+        
+        assert len(results) == len(items)
+        assert all(result["session_id"] == session_id for result in results[:len(MESSAGES)])
+        assert results[-1]["session_id"] != session_id
+        assert len(self.chat_service.get_session_history(session_id)) == 2 * len(MESSAGES)
+    
+    def test_budget_applies_per_item(self):
+        """Test that the last item of a chunk gets the same latency budget as the first"""
+        self.chat_service.chatbot_model.generation_engine.ms_per_token = 5
+        items = [(None, f"tell me about your weekend {i}") for i in range(6)]
+        results = self.chat_service.process_batch(items, latency_budget_ms=500)
+        
+        paths = [result["metadata"]["path"] for result in results]
+        assert paths[0] == "conversational"
+        assert paths[-1] == paths[0]
+    
+    def test_budget_fallback_counts_retrieval_once(self):
+        """Test that falling back on an exhausted budget does not run the retrieval cascade again"""
+        model = self.chat_service.chatbot_model
+        items = [(None, f"tell me about your weekend {i}") for i in range(3)]
+        before = sum(model.retrieval_stages.values())
+        results = self.chat_service.process_batch(items, latency_budget_ms=0.001)
+        
+        assert all(result["metadata"]["path"].endswith("_fallback") for result in results)
+        assert sum(model.retrieval_stages.values()) - before == len(items)
+    
+    def test_wordless_messages_are_not_cached(self):
+        """Test that non-ASCII messages keep their own keys and wordless ones skip both caches"""
+        model = self.chat_service.chatbot_model
+        assert self.chat_service._cache_key("¿?") is None
+        assert self.chat_service._cache_key("पेट में दर्द") != self.chat_service._cache_key("दर्द")
+        
+        model.embedding_cache.clear()
+        model._encode_query("¿?")
+        model._encode_queries(["🙂", "¿?"])
+        assert model.embedding_cache.stats()["size"] == 0
@@ -0,0 +1,52 @@
+import sys
+import os
+import threading
+
+import pytest
+
+# Add the app directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'app')))
+
+from utils.batching import MicroBatcher
+
+
+class TestMicroBatcher:
+    """Test suite for the micro-batching scheduler"""
+    
+    def test_concurrent_items_share_a_batch(self):
+        """Test that items arriving within the wait window are processed together"""
+        calls = []
+        
+        def process_batch(items):
+            calls.append(list(items))
+            return [item * 2 for item in items]
+        
+        batcher = MicroBatcher(process_batch, max_batch_size=8, max_wait_ms=200)
+        results = {}
+        
+        def worker(value):
+            results[value] = batcher.process(value, timeout=5)
+        
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        batcher.close()
+        
+        assert results == {i: i * 2 for i in range(8)}
+        assert len(calls) < 8
+        assert batcher.stats()["items"] == 8
+    
+    def test_errors_reach_every_caller(self):
+        """Test that a failing batch raises in each waiting caller"""
+        def process_batch(items):
+            raise ValueError("encoder failed")
+        
+        batcher = MicroBatcher(process_batch, max_wait_ms=0)
+        future = batcher.submit("query")
+        try:
+            with pytest.raises(ValueError, match="encoder failed"):
+                future.result(timeout=5)
+        finally:
+            batcher.close()
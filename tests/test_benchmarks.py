@@ -0,0 +1,32 @@
+import sys
+import os
+
+# Add the app and benchmarks directories to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'app')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'benchmarks')))
+
+import pipeline_benchmark
+from stub_models import StubEmbedder
+
+
+class TestBenchmarkSuite:
+    """Smoke tests for the offline benchmark backend"""
+    
+    def test_stub_embedder_is_deterministic(self):
+        """Test that the stub embedder returns identical unit vectors across instances"""
+        first = StubEmbedder(16).encode(["burning stomach pain"])
+        second = StubEmbedder(16).encode(["burning stomach pain"])
+        
+        assert (first == second).all()
+        assert abs(float((first[0] ** 2).sum()) - 1.0) < 1e-5
+    
+    def test_pipeline_microbenchmarks_run_offline(self):
+        """Test that the microbenchmarks run on the stub models and report percentiles"""
+        results = pipeline_benchmark.run(iterations=10)
+        
+        assert set(results["microbenchmarks"]) == {
+            "find_relevant_medical_info", "_handle_general_questions",
+            "_generate_suggestions", "_generate_medical_response"
+        }
+        assert results["microbenchmarks"]["find_relevant_medical_info"]["count"] == 10
+        assert results["peak_rss_mb"] > 0
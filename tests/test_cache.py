@@ -0,0 +1,43 @@
+import sys
+import os
+import time
+
+# Add the app directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'app')))
+
+from utils.cache import LRUCache
+from utils.text_processor import normalize_text
+
+
+class TestLRUCache:
+    """Test suite for the response and embedding caches"""
+    
+    def test_lru_eviction_and_stats(self):
+        """Test that the least recently used entry is dropped and lookups are counted"""
+        cache = LRUCache(max_size=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        assert cache.get("a") == 1
+        cache.put("c", 3)
+        
+        assert cache.get("b") is None
+        assert cache.get("c") == 3
+        assert cache.stats()["hits"] == 2
+        assert cache.stats()["misses"] == 1
+    
+    def test_ttl_expiry(self):
+        """Test that entries expire after the TTL"""
+        cache = LRUCache(max_size=2, ttl_seconds=0.05)
+        cache.put("a", 1)
+        time.sleep(0.1)
+        assert cache.get("a") is None
+    
+    def test_normalized_keys_match_near_duplicates(self):
+        """Test that case, spacing and punctuation do not change the cache key"""
+        assert normalize_text("I have  stomach pain!") == normalize_text("i have stomach pain")
+    
+    def test_normalization_keeps_non_ascii_words(self):
+        """Test that accented and non-Latin words survive, and wordless messages normalize to empty"""
+        assert normalize_text("Café, ÜBEL!") == "café übel"
+        assert normalize_text("पेट में दर्द") != ""
+        assert normalize_text("¿?") == normalize_text("🙂") == ""
@@ -87,3 +87,24 @@ class TestMedicalChatbot:
         for query in emergency_queries:
             response = self.chatbot_model.generate_response(query)
             assert "emergency" in response.lower() or "immediate" in response.lower() or "urgent" in response.lower()
+    
+    def test_query_embedded_once_per_turn(self):
+        """Test that each chat turn encodes the user message only once"""
+        embedding_model = self.chat_service.chatbot_model.embedding_model
+        original_encode = embedding_model.encode
+        calls = []
+        
+        def counting_encode(texts, *args, **kwargs):
+            calls.append(texts)
+            return original_encode(texts, *args, **kwargs)
+        
+        embedding_model.encode = counting_encode
+        try:
+            session_id = self.chat_service.create_session()
+            result = self.chat_service.process_message(session_id, "burning stomach pain and nausea")
+        finally:
+            embedding_model.encode = original_encode
+        
+        # Confident lexical matches skip the embedder entirely
+        assert len(calls) <= 1
+        assert len(result["suggestions"]) > 0
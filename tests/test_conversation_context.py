@@ -0,0 +1,41 @@
+import sys
+import os
+
+# Add the app directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'app')))
+
+from models.conversation_context import ConversationTokenCache
+
+
+class TestConversationTokenCache:
+    """Test suite for per-session cached turn token IDs"""
+    
+    def setup_method(self):
+        self.calls = []
+    
+    def tokenize(self, text):
+        self.calls.append(text)
+        return [len(word) for word in text.split()]
+    
+    def test_each_message_is_tokenized_once(self):
+        """Test that repeated turns in a session reuse the cached token IDs"""
+        cache = ConversationTokenCache()
+        cache.encode("s1", "my stomach hurts", self.tokenize)
+        cache.encode("s1", "my stomach hurts", self.tokenize)
+        cache.encode("s2", "my stomach hurts", self.tokenize)
+        
+        assert self.calls == ["my stomach hurts", "my stomach hurts"]
+        assert cache.stats()["reused"] == 1
+    
+    def test_remembered_replies_skip_tokenization(self):
+        """Test that generated replies stored with their IDs are never tokenized"""
+        cache = ConversationTokenCache(max_messages=2)
+        cache.remember("s1", "try resting", [7, 8])
+        
+        assert cache.encode("s1", "try resting", self.tokenize) == [7, 8]
+        assert self.calls == []
+        
+        cache.remember("s1", "a", [1])
+        cache.remember("s1", "b", [2])
+        cache.encode("s1", "try resting", self.tokenize)
+        assert self.calls == ["try resting"]
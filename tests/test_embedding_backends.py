@@ -0,0 +1,66 @@
+import sys
+import os
+import tempfile
+
+import pytest
+
+# Add the app and benchmarks directories to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'app')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'benchmarks')))
+
+from config import settings
+from models.chatbot_model import MedicalChatbotModel
+from models.embedding_backends import create_embedder, topk_agreement
+from models.embedding_index import EmbeddingIndexStore
+from stub_models import StubEmbedder
+
+CORPUS = [
+    "gastritis burning stomach pain nausea",
+    "appendicitis sharp pain lower right fever",
+    "gallstones severe pain after fatty meals",
+    "lactose intolerance bloating after milk",
+]
+
+
+class CountingEmbedder(StubEmbedder):
+    """Stub fp32 reference that counts its encode calls"""
+    
+    calls = 0
+    
+    def encode(self, texts, **kwargs):
+        self.calls += 1
+        return super().encode(texts, **kwargs)
+
+
+class TestEmbeddingBackends:
+    """Test suite for embedding backend selection and the fp32 agreement check"""
+    
+    def test_unknown_backend(self):
+        """Test that an unknown backend name is rejected"""
+        with pytest.raises(ValueError):
+            create_embedder("tensorrt", "all-MiniLM-L6-v2")
+    
+    def test_agreement(self):
+        """Test that identical backends agree fully and a different one does not"""
+        assert topk_agreement(StubEmbedder(32), StubEmbedder(32), CORPUS, top_k=1) == 1.0
+        assert topk_agreement(StubEmbedder(32), StubEmbedder(64), CORPUS, top_k=1) < 1.0
+    
+    def test_agreement_is_stored_with_the_index(self):
+        """Test that the agreement check runs when the index is built and is read back on later starts"""
+        def start(index_dir):
+            model = MedicalChatbotModel()
+            model.index_store = EmbeddingIndexStore(index_dir, settings.EMBEDDING_DIMENSION)
+            model.embedding_model = StubEmbedder(settings.EMBEDDING_DIMENSION)
+            model.embedding_model_name, model.embedding_backend = "stub-hash-embedder", "stub_int8"
+            model._agreement_reference = CountingEmbedder(settings.EMBEDDING_DIMENSION)
+            model._generate_medical_embeddings()
+            return model
+        
+        with tempfile.TemporaryDirectory() as index_dir:
+            first = start(index_dir)
+            assert first._agreement_reference.calls > 0
+            assert first.embedding_agreement == 1.0
+            
+            second = start(index_dir)
+            assert second._agreement_reference.calls == 0
+            assert second.embedding_agreement == 1.0
@@ -0,0 +1,42 @@
+import sys
+import os
+
+import numpy as np
+
+# Add the app directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'app')))
+
+from models.embedding_index import EmbeddingIndexStore
+
+
+class TestEmbeddingIndexStore:
+    """Test suite for the persistent knowledge embedding index"""
+    
+    def setup_method(self):
+        self.knowledge = {"gastritis": {"description": "Inflammation of the stomach lining."}}
+        self.texts = ["gastritis: Inflammation of the stomach lining."]
+        self.labels = ["gastritis"]
+        self.embeddings = np.random.RandomState(0).rand(1, 4)
+    
+    def test_roundtrip_is_memory_mapped(self, tmp_path):
+        """Test that a saved index is mapped back read-only as float32"""
+        store = EmbeddingIndexStore(str(tmp_path), dimension=4)
+        content_hash = store.compute_hash(self.knowledge, self.texts, "test-model")
+        store.save(content_hash, self.texts, self.labels, self.embeddings)
+        
+        index = store.load(content_hash)
+        assert index is not None
+        assert isinstance(index["embeddings"], np.memmap)
+        assert index["embeddings"].dtype == np.float32
+        assert index["labels"] == self.labels
+        np.testing.assert_allclose(index["embeddings"], self.embeddings, rtol=1e-6)
+    
+    def test_stale_hash_is_rejected(self, tmp_path):
+        """Test that a knowledge or model change invalidates the stored index"""
+        store = EmbeddingIndexStore(str(tmp_path), dimension=4)
+        content_hash = store.compute_hash(self.knowledge, self.texts, "test-model")
+        store.save(content_hash, self.texts, self.labels, self.embeddings)
+        
+        assert store.load(store.compute_hash(self.knowledge, self.texts, "other-model")) is None
+        changed = {"gastritis": {"description": "Changed."}}
+        assert store.load(store.compute_hash(changed, self.texts, "test-model")) is None
@@ -0,0 +1,127 @@
+import sys
+import os
+import tempfile
+
+import pytest
+
+# Add the app and benchmarks directories to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'app')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'benchmarks')))
+
+from models.chatbot_model import MedicalChatbotModel
+from models.generation_engine import (
+    CPUGenerationEngine, group_by_deadline, left_pad, trim_batch_outputs
+)
+from stub_models import install_stub_models
+
+EOS = 0
+
+
+class FakeTokenizer:
+    """Tokenizer stand-in: one token ID per character"""
+
+    eos_token_id = EOS
+
+    def encode(self, text):
+        return [ord(char) for char in text]
+
+
+class FakeModel:
+    """Causal LM stand-in that continues each row with its last real token + 1
+
+    A row whose next token would reach its stop value emits EOS instead and
+    is then padded with EOS, as generate() does for finished rows.
+    """
+
+    def __init__(self, stops):
+        self.stops = stops
+        self.calls = []
+
+    def eval(self):
+        pass
+
+    def generate(self, input_ids, attention_mask, max_new_tokens, pad_token_id, **kwargs):
+        import torch
+
+        self.calls.append((input_ids.tolist(), attention_mask.tolist(), max_new_tokens))
+        rows = []
+        for prompt, stop in zip(input_ids.tolist(), self.stops):
+            token, new, done = prompt[-1], [], False
+            for _ in range(max_new_tokens):
+                token += 1
+                if done or token >= stop:
+                    done = True
+                    new.append(pad_token_id)
+                else:
+                    new.append(token)
+            rows.append(prompt + new)
+        return torch.tensor(rows)
+
+
+class TestBatchHelpers:
+    """Test suite for the padding and trimming around a batched generate() call"""
+
+    def test_left_pad_aligns_prompts_on_the_right(self):
+        """Test that shorter prompts are padded on the left and masked out"""
+        input_ids, attention_mask = left_pad([[5, 6, 7], [8]], pad_id=EOS)
+        assert input_ids == [[5, 6, 7], [EOS, EOS, 8]]
+        assert attention_mask == [[1, 1, 1], [0, 0, 1]]
+
+    def test_rows_are_cut_to_their_own_limit_and_first_eos(self):
+        """Test that each row keeps its own token limit and stops after its EOS"""
+        rows = [[1, 2, 3, 4], [1, EOS, EOS, EOS], [1, 2, 3, EOS]]
+        assert trim_batch_outputs(rows, [2, 4, 4], EOS) == [[1, 2], [1, EOS], [1, 2, 3, EOS]]
+
+    def test_deadlines_are_grouped_tightest_first(self):
+        """Test that requests only share a batch with similar deadlines"""
+        groups = group_by_deadline([10.0, 0.5, None, 0.6, 9.0, None], slack=1.5)
+        assert groups == [[1, 3], [4, 0], [2, 5]]
+
+
+class TestCPUGenerationEngineBatch:
+    """Test suite for CPUGenerationEngine.generate_batch on a fake model"""
+
+    def test_outputs_follow_prompt_order_and_row_limits(self):
+        """Test that batch outputs map back to their prompts, each within its own limit"""
+        pytest.importorskip("torch")
+        model = FakeModel(stops=[1000, 1000, 23])
+        engine = CPUGenerationEngine(model, FakeTokenizer(), prefix="", reuse_prefix_cache=False)
+
+        outputs = engine.generate_batch([[10, 11, 12], [100], [20]], [2, 5, 5], do_sample=False)
+
+        assert outputs == [[13, 14], [101, 102, 103, 104, 105], [21, 22, EOS]]
+        input_ids, attention_mask, max_new_tokens = model.calls[0]
+        assert input_ids == [[10, 11, 12], [EOS, EOS, 100], [EOS, EOS, 20]]
+        assert attention_mask == [[1, 1, 1], [0, 0, 1], [0, 0, 1]]
+        assert max_new_tokens == 5
+
+
+class TestGenerateBatchDeadlines:
+    """Test suite for splitting queued fallbacks into batches by deadline"""
+
+    def setup_method(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.model = MedicalChatbotModel()
+        install_stub_models(self.model, os.path.join(self.tmp.name, "index"))
+
+    def teardown_method(self):
+        self.tmp.cleanup()
+
+    def test_generous_budget_is_not_cut_by_a_tight_one(self):
+        """Test that a request keeps its own budget when a tighter one joins the queue"""
+        engine = self.model.generation_engine
+        calls = []
+        original_generate_batch = engine.generate_batch
+
+        def generate_batch(prompts, max_new_tokens, **kwargs):
+            calls.append((prompts, kwargs["max_time"]))
+            return original_generate_batch(prompts, max_new_tokens, **kwargs)
+
+        engine.generate_batch = generate_batch
+        outputs = self.model._generate_batch([([1], 3, 30.0), ([2], 2, 0.5), ([3], 4, None), ([4], 1, 0.6)])
+
+        assert [len(output) for output in outputs] == [3, 2, 4, 1]
+        assert [prompts for prompts, _ in calls] == [[[2], [4]], [[1]], [[3]]]
+        assert calls[0][1] <= 0.5
+        assert 29.0 < calls[1][1] <= 30.0
+        assert calls[2][1] is None
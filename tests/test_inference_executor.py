@@ -0,0 +1,125 @@
+import sys
+import os
+import asyncio
+import pickle
+import tempfile
+import threading
+import time
+
+import pytest
+
+# Add the app and benchmarks directories to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'app')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'benchmarks')))
+
+from services.chat_service import ChatService
+from services.inference_executor import InferenceExecutor, run_turn
+from stub_models import install_stub_models
+
+
+class TestInferenceExecutor:
+    """Test suite for running model calls off the event loop"""
+
+    def test_unknown_mode_is_rejected(self):
+        """Test that only the thread and process modes are accepted"""
+        with pytest.raises(ValueError):
+            InferenceExecutor(mode="fiber")
+
+    def test_in_flight_bound_is_respected(self):
+        """Test that no more than max_in_flight calls run at once, even with spare workers"""
+        executor = InferenceExecutor(mode="thread", max_workers=8, max_in_flight=2)
+        lock = threading.Lock()
+        running = []
+        peak = []
+
+        def work():
+            with lock:
+                running.append(1)
+                peak.append(len(running))
+            time.sleep(0.02)
+            with lock:
+                running.pop()
+
+        async def scenario():
+            await asyncio.gather(*(executor.run(work) for _ in range(6)))
+
+        asyncio.run(scenario())
+        executor.shutdown()
+        assert max(peak) == 2
+        stats = executor.stats()
+        assert (stats["in_flight"], stats["waiting"], stats["completed"]) == (0, 0, 6)
+
+    def test_waiting_calls_run_by_priority(self):
+        """Test that a freed in-flight slot goes to the lowest priority number first"""
+        executor = InferenceExecutor(mode="thread", max_workers=2, max_in_flight=1)
+        release = threading.Event()
+        order = []
+
+        async def scenario():
+            holder = asyncio.ensure_future(executor.run(release.wait))
+            await asyncio.sleep(0.01)
+            waiters = [asyncio.ensure_future(executor.run(order.append, name, priority=priority))
+                       for name, priority in (("generative", 2), ("medical", 1), ("urgent", 0))]
+            await asyncio.sleep(0.01)
+            assert executor.stats()["waiting"] == 3
+            release.set()
+            await asyncio.gather(holder, *waiters)
+
+        asyncio.run(scenario())
+        executor.shutdown()
+        assert order == ["urgent", "medical", "generative"]
+
+
+class TestInferenceExecutorTurns:
+    """Test suite for chat turns run through the executor on the stub models"""
+
+    def setup_method(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.chat_service = ChatService(load_models=False)
+        self.model = self.chat_service.chatbot_model
+        install_stub_models(self.model, os.path.join(self.tmp.name, "index"))
+
+    def teardown_method(self):
+        self.chat_service.shutdown()
+        self.tmp.cleanup()
+
+    def test_async_turn_returns_worker_timings_and_path(self):
+        """Test that the path and stage timings recorded on the worker reach the response"""
+        self.chat_service.executor.shutdown()
+        self.chat_service.executor = InferenceExecutor(mode="thread", max_workers=2, max_in_flight=2)
+        worker_threads = []
+        original_retrieve = self.model.retrieve
+
+        def retrieve(analysis):
+            worker_threads.append(threading.current_thread().name)
+            return original_retrieve(analysis)
+
+        self.model.retrieve = retrieve
+
+        async def scenario():
+            return await asyncio.gather(
+                self.chat_service.process_message_async(None, "sharp pain in upper right abdomen",
+                                                        include_timings=True),
+                self.chat_service.process_message_async(None, "tell me about your weekend",
+                                                        include_timings=True)
+            )
+
+        medical, conversational = asyncio.run(scenario())
+        assert all(name.startswith("inference") for name in worker_threads)
+        assert medical["metadata"]["path"] == "medical"
+        assert "retrieval" in medical["metadata"]["timings_ms"]
+        assert conversational["metadata"]["path"] == "conversational"
+        assert "generation" in conversational["metadata"]["timings_ms"]
+        assert self.chat_service.executor.stats()["completed"] == 2
+
+    def test_turn_round_trips_analysis_like_a_process_worker(self):
+        """Test that an analysis pickled to and from a worker keeps the worker's path and timings"""
+        analysis = self.model.analyze_query("sharp pain in upper right abdomen", retrieve=False)
+        response, worker_analysis = run_turn(self.model, "sharp pain in upper right abdomen", [],
+                                             pickle.loads(pickle.dumps(analysis)))
+
+        returned = pickle.loads(pickle.dumps(worker_analysis))
+        assert response
+        assert returned.response_path == "medical"
+        assert set(returned.timings.report()) >= {"intent", "retrieval", "templating"}
+        assert analysis.response_path != "medical"
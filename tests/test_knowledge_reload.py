@@ -0,0 +1,93 @@
+import sys
+import os
+import copy
+import json
+import tempfile
+
+# Add the app and benchmarks directories to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'app')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'benchmarks')))
+
+from data.medical_data import ABDOMINAL_PAIN_KNOWLEDGE
+from models.chatbot_model import MedicalChatbotModel
+from services.chat_service import ChatService
+from stub_models import install_stub_models
+
+
+class TestKnowledgeReload:
+    """Test suite for hot-reloading the knowledge base"""
+    
+    def setup_method(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.knowledge_path = os.path.join(self.tmp.name, "knowledge.json")
+        self.knowledge = copy.deepcopy(ABDOMINAL_PAIN_KNOWLEDGE)
+        self._write()
+        
+        self.model = MedicalChatbotModel()
+        self.model.knowledge_path = self.knowledge_path
+        install_stub_models(self.model, os.path.join(self.tmp.name, "index"))
+    
+    def teardown_method(self):
+        self.tmp.cleanup()
+    
+    def _write(self):
+        with open(self.knowledge_path, "w") as f:
+            json.dump(self.knowledge, f)
+    
+    def test_only_changed_conditions_are_encoded(self):
+        """Test that a reload re-embeds just the edited condition and swaps the version"""
+        old_version = self.model.knowledge_version
+        self.knowledge["conditions"]["gastritis"]["description"] = "Irritated stomach lining."
+        self._write()
+        
+        result = self.model.reload_knowledge()
+        
+        assert result["encoded"] == 1
+        assert result["reused"] == len(self.knowledge["conditions"]) - 1
+        assert self.model.knowledge_version != old_version
+        assert self.model.medical_knowledge["conditions"]["gastritis"]["description"] == "Irritated stomach lining."
+    
+    def test_new_condition_is_searchable(self):
+        """Test that added conditions and keyword tables are live after a reload"""
+        self.knowledge["conditions"]["pancreatitis"] = {
+            "symptoms": ["upper abdominal pain radiating to the back"],
+            "causes": ["gallstones", "alcohol"],
+            "severity": "severe",
+            "duration": "acute",
+            "location": "upper abdomen",
+            "description": "Inflammation of the pancreas."
+        }
+        self._write()
+        self.model.reload_knowledge()
+        
+        results = self.model.find_relevant_medical_info("pancreatitis inflammation of the pancreas")
+        assert results[0]["condition"] == "pancreatitis"
+    
+    def test_invalid_file_keeps_current_snapshot(self):
+        """Test that a broken knowledge file leaves the served knowledge untouched"""
+        snapshot = self.model.snapshot
+        with open(self.knowledge_path, "w") as f:
+            f.write('{"conditions": {}}')
+        os.utime(self.knowledge_path, (0, 12345))
+        
+        assert not self.model.reload_if_changed()
+        assert self.model.snapshot is snapshot
+    
+    def test_changed_warning_sign_bypasses_cached_response(self):
+        """Test that a reload adding a warning sign is not hidden by a cached response"""
+        chat_service = ChatService(load_models=False)
+        chat_service.chatbot_model = self.model
+        try:
+            message = "burning stomach pain and vomiting blood"
+            first = chat_service.process_message(None, message)
+            assert "Urgent" not in first["response"]
+            
+            self.knowledge["warning_signs"].append("vomiting blood")
+            self._write()
+            self.model.reload_knowledge()
+            
+            second = chat_service.process_message(None, message)
+            assert second["metadata"]["path"] != "cache"
+            assert "Urgent" in second["response"]
+        finally:
+            chat_service.shutdown()
@@ -0,0 +1,35 @@
+import sys
+import os
+
+# Add the app directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'app')))
+
+from utils.metrics import MetricsRegistry
+
+
+class TestMetricsRegistry:
+    """Test suite for the /metrics exposition"""
+    
+    def test_histogram_buckets_are_cumulative(self):
+        """Test that histogram buckets, sum and count follow the text format"""
+        registry = MetricsRegistry()
+        histogram = registry.histogram("stage_seconds", "Stage time", ["stage"], buckets=[0.1, 1.0])
+        histogram.observe(0.05, "retrieval")
+        histogram.observe(0.5, "retrieval")
+        histogram.observe(5.0, "retrieval")
+        
+        output = registry.render()
+        assert "# TYPE stage_seconds histogram" in output
+        assert 'stage_seconds_bucket{stage="retrieval",le="0.1"} 1' in output
+        assert 'stage_seconds_bucket{stage="retrieval",le="1"} 2' in output
+        assert 'stage_seconds_bucket{stage="retrieval",le="+Inf"} 3' in output
+        assert 'stage_seconds_count{stage="retrieval"} 3' in output
+    
+    def test_counter_and_reregistration(self):
+        """Test that counters accumulate and re-registering returns the same family"""
+        registry = MetricsRegistry()
+        counter = registry.counter("responses_total", "Responses", ["path"])
+        counter.inc("medical")
+        registry.counter("responses_total", "Responses", ["path"]).inc("medical")
+        
+        assert 'responses_total{path="medical"} 2' in registry.render()
@@ -0,0 +1,32 @@
+import sys
+import os
+
+# Add the app directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'app')))
+
+from data.medical_data import ABDOMINAL_PAIN_KNOWLEDGE
+from utils.response_formatter import DISCLAIMER, URGENT_BANNER, build_suggestions, compile_templates
+
+
+class TestResponseTemplates:
+    """Test suite for the precompiled condition answers and suggestions"""
+    
+    def setup_method(self):
+        self.templates = compile_templates(ABDOMINAL_PAIN_KNOWLEDGE["conditions"])
+    
+    def test_urgent_banner_is_the_only_dynamic_part(self):
+        """Test that the urgent render adds the banner before the disclaimer"""
+        template = self.templates["appendicitis"]
+        
+        assert template.render().startswith("Based on your symptoms, you might be experiencing Appendicitis.")
+        assert template.render().endswith(DISCLAIMER)
+        assert template.render(urgent=True) == template.render()[:-len(DISCLAIMER)] + URGENT_BANNER + DISCLAIMER
+    
+    def test_suggestions_are_capped(self):
+        """Test that condition questions come first and symptom follow-ups fill the rest"""
+        assert build_suggestions(self.templates["gastritis"], {"pain", "fever"})[0] == "What causes gastritis?"
+        assert build_suggestions(None, {"nausea", "fever"}) == [
+            "Are you also experiencing vomiting?",
+            "What is your current temperature?"
+        ]
+        assert len(build_suggestions(None, {"pain", "nausea", "fever"})) == 4
@@ -0,0 +1,49 @@
+import sys
+import os
+
+import numpy as np
+
+# Add the app directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'app')))
+
+from models.lexical_index import BM25Index
+from models.retrievers import create_retriever, recall_at_k
+
+
+class TestRetrievers:
+    """Test suite for the retrieval backends"""
+    
+    def setup_method(self):
+        rng = np.random.RandomState(42)
+        self.embeddings = rng.randn(200, 16).astype(np.float32)
+        self.embeddings /= np.linalg.norm(self.embeddings, axis=1, keepdims=True)
+        self.queries = rng.randn(10, 16).astype(np.float32)
+        self.queries /= np.linalg.norm(self.queries, axis=1, keepdims=True)
+    
+    def test_exact_matches_brute_force(self):
+        """Test that the argpartition search returns the brute-force ranking"""
+        brute_scores, brute_indices = create_retriever("brute_force", self.embeddings).search(self.queries, 5)
+        exact_scores, exact_indices = create_retriever("exact", self.embeddings).search(self.queries, 5)
+        
+        np.testing.assert_array_equal(brute_indices, exact_indices)
+        np.testing.assert_allclose(brute_scores, exact_scores, rtol=1e-5)
+        assert recall_at_k(brute_indices, exact_indices) == 1.0
+    
+    def test_top_k_larger_than_index(self):
+        """Test that asking for more neighbours than exist returns every entry"""
+        scores, indices = create_retriever("exact", self.embeddings[:3]).search(self.queries[:1], 5)
+        assert sorted(indices[0].tolist()) == [0, 1, 2]
+        assert list(scores[0]) == sorted(scores[0], reverse=True)
+    
+    def test_bm25_ranks_named_condition_first(self):
+        """Test that a query naming a condition ranks it first with full coverage"""
+        index = BM25Index([
+            "gastritis: Inflammation of the stomach lining. Symptoms: burning stomach pain, nausea.",
+            "kidney_stones: Hard deposits in kidneys. Symptoms: severe flank pain, blood in urine.",
+            "appendicitis: Inflammation of the appendix. Symptoms: sharp pain near navel, fever."
+        ])
+        
+        hits = index.search("blood in urine", top_k=3)
+        assert hits[0][0] == 1
+        assert hits[0][2] == 1.0
+        assert index.search("what is the", top_k=3) == []
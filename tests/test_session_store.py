@@ -0,0 +1,107 @@
+import sys
+import os
+import json
+import sqlite3
+import time
+
+# Add the app directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'app')))
+
+from services.session_store import InMemorySessionStore, SQLiteSessionStore
+
+
+class TestSessionStores:
+    """Test suite for the session store backends"""
+    
+    def test_lru_eviction(self):
+        """Test that the least recently used session is evicted at capacity"""
+        store = InMemorySessionStore(max_sessions=2, ttl_seconds=3600, max_messages=10)
+        store.create("a")
+        store.create("b")
+        assert "a" in store  # touch "a" so "b" becomes least recent
+        store.create("c")
+        
+        assert "a" in store
+        assert "b" not in store
+        assert "c" in store
+    
+    def test_ttl_expiry(self):
+        """Test that idle sessions expire"""
+        store = InMemorySessionStore(max_sessions=10, ttl_seconds=0.05, max_messages=10)
+        store.create("a")
+        time.sleep(0.1)
+        assert "a" not in store
+    
+    def test_message_cap(self):
+        """Test that only the most recent messages are kept"""
+        store = InMemorySessionStore(max_sessions=10, ttl_seconds=3600, max_messages=3)
+        store.create("a")
+        for i in range(5):
+            store.append("a", "user", f"message {i}")
+        
+        history = store.history("a")
+        assert [msg["content"] for msg in history] == ["message 2", "message 3", "message 4"]
+        assert store.recent_contents("a", 2) == ["message 3", "message 4"]
+    
+    def test_sqlite_history_shared_between_stores(self, tmp_path):
+        """Test that two store instances (as in two workers) see the same history"""
+        path = str(tmp_path / "sessions.db")
+        first = SQLiteSessionStore(path, max_sessions=10, ttl_seconds=3600, max_messages=3)
+        second = SQLiteSessionStore(path, max_sessions=10, ttl_seconds=3600, max_messages=3)
+        
+        first.create("a")
+        first.append("a", "user", "I have stomach pain")
+        second.append("a", "assistant", "Where is the pain located?")
+        for i in range(2):
+            first.append("a", "user", f"follow up {i}")
+        
+        assert "a" in second
+        history = second.history("a")
+        assert [msg["role"] for msg in history] == ["assistant", "user", "user"]
+        assert history[0]["content"] == "Where is the pain located?"
+    
+    def test_history_cursor_pagination(self, tmp_path):
+        """Test that both backends page history by sequence number and report the next cursor"""
+        stores = [
+            InMemorySessionStore(max_sessions=10, ttl_seconds=3600, max_messages=10),
+            SQLiteSessionStore(str(tmp_path / "sessions.db"), max_sessions=10, ttl_seconds=3600, max_messages=10)
+        ]
+        for store in stores:
+            store.create("a")
+            for i in range(5):
+                store.append("a", "user", f"message {i}")
+            
+            records, next_since, has_more = store.history_page("a", since=0, limit=3)
+            assert [json.loads(record)["content"] for record in records] == ["message 0", "message 1", "message 2"]
+            assert (next_since, has_more) == (3, True)
+            
+            records, next_since, has_more = store.history_page("a", since=next_since, limit=3)
+            assert [json.loads(record)["seq"] for record in records] == [4, 5]
+            assert (next_since, has_more) == (5, False)
+            
+            # Polling with the latest cursor returns nothing until a new turn arrives
+            assert store.history_page("a", since=5) == ([], 5, False)
+            store.append("a", "assistant", "reply")
+            records, next_since, _ = store.history_page("a", since=5)
+            assert json.loads(records[0])["role"] == "assistant" and next_since == 6
+    
+    def test_sqlite_migrates_messages_without_serialized_records(self, tmp_path):
+        """Test that messages stored before the record column existed are serialized on read"""
+        path = str(tmp_path / "sessions.db")
+        conn = sqlite3.connect(path)
+        conn.executescript("""
+            CREATE TABLE sessions (id TEXT PRIMARY KEY, created_at REAL NOT NULL, last_access REAL NOT NULL);
+            CREATE TABLE messages (
+                session_id TEXT NOT NULL, seq INTEGER NOT NULL, role TEXT NOT NULL,
+                content TEXT NOT NULL, ts REAL NOT NULL, PRIMARY KEY (session_id, seq)
+            ) WITHOUT ROWID;
+        """)
+        now = time.time()
+        conn.execute("INSERT INTO sessions VALUES ('a', ?, ?)", (now, now))
+        conn.execute("INSERT INTO messages VALUES ('a', 1, 'user', 'old message', ?)", (now,))
+        conn.commit()
+        conn.close()
+        
+        store = SQLiteSessionStore(path, max_sessions=10, ttl_seconds=3600, max_messages=10)
+        store.append("a", "assistant", "new message")
+        assert [msg["content"] for msg in store.history("a")] == ["old message", "new message"]
@@ -0,0 +1,87 @@
+import sys
+import os
+import tempfile
+
+# Add the app and benchmarks directories to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'app')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'benchmarks')))
+
+from config import settings
+from models.chatbot_model import MEDICAL_CONTEXT, OFF_TOPIC_RESPONSE
+from services.chat_service import ChatService
+from stub_models import STUB_REPLY, StubGenerationEngine, install_stub_models
+
+ON_TOPIC_REPLY = "Thanks for asking. If the abdominal pain comes back after meals, please see a doctor."
+OFF_TOPIC_REPLY = "the weather was lovely so we walked along the river and then had lunch " * 8
+
+
+class TestStreaming:
+    """Test suite for the held-back conversational stream on the stub engine"""
+
+    def setup_method(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.chat_service = ChatService(load_models=False)
+        self.model = self.chat_service.chatbot_model
+        install_stub_models(self.model, os.path.join(self.tmp.name, "index"))
+        self.streams = []
+
+    def teardown_method(self):
+        self.chat_service.shutdown()
+        self.tmp.cleanup()
+
+    def use_reply(self, reply, ms_per_token=0.0):
+        """Replay `reply` from the stub engine, recording each stream it starts"""
+        engine = StubGenerationEngine(self.model.tokenizer, MEDICAL_CONTEXT, ms_per_token, reply=reply)
+        original_stream = engine.stream
+
+        def stream(*args, **kwargs):
+            self.streams.append(original_stream(*args, **kwargs))
+            return self.streams[-1]
+
+        engine.stream = stream
+        self.model.generation_engine = self.model.model = engine
+        return engine
+
+    def test_on_topic_reply_is_released_and_remembered(self):
+        """Test that an on-topic reply streams in full and its IDs are kept for the next turn"""
+        engine = self.use_reply(ON_TOPIC_REPLY)
+        events = list(self.chat_service.stream_message(None, "tell me about your weekend"))
+
+        tokens = [event["text"] for event in events if event["type"] == "token"]
+        reply = "".join(tokens).strip()
+        assert reply == ON_TOPIC_REPLY
+        # The words held back until the filter passed arrive together as the first chunk
+        assert tokens[0] == "Thanks for asking. If the abdominal"
+        assert events[-1]["response"] == ON_TOPIC_REPLY
+        assert events[-1]["metadata"]["path"] == "conversational"
+
+        def tokenize(text):
+            raise AssertionError("streamed reply was tokenized again")
+
+        session_id = events[0]["session_id"]
+        reply_ids = engine.reply_ids[:-1]
+        assert self.model.context_cache.encode(session_id, reply, tokenize) == reply_ids
+
+    def test_off_topic_reply_is_aborted_after_filter_words(self):
+        """Test that generation stops once the filter has seen enough off-topic words"""
+        engine = self.use_reply(OFF_TOPIC_REPLY, ms_per_token=5)
+        chunks = list(self.model.stream_response("tell me about your weekend"))
+
+        assert chunks == [OFF_TOPIC_RESPONSE]
+        generated = len(self.streams[0].output_ids)
+        assert settings.STREAM_FILTER_WORDS <= generated < min(len(engine.reply_ids), settings.GENERATION_MAX_NEW_TOKENS)
+
+    def test_closing_the_stream_stops_generation(self):
+        """Test that a client disconnect mid-stream stops the worker and remembers nothing"""
+        self.use_reply(" ".join([STUB_REPLY] * 6), ms_per_token=5)
+        analysis = self.model.analyze_query("tell me about your weekend")
+        analysis.session_id = "disconnected"
+        chunks = self.model.stream_response("tell me about your weekend", analysis=analysis)
+
+        first = next(chunks)
+        assert self.model._is_medical_related(first)
+        chunks.close()
+
+        generated = len(self.streams[0].output_ids)
+        assert generated < settings.GENERATION_MAX_NEW_TOKENS
+        assert self.model.context_cache.encode("disconnected", first.strip(), lambda text: []) == []
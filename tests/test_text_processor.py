@@ -0,0 +1,45 @@
+import sys
+import os
+
+# Add the app directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'app')))
+
+from data.medical_data import ABDOMINAL_PAIN_KNOWLEDGE
+from utils.text_processor import KeywordMatcher
+
+
+class TestKeywordMatcher:
+    """Test suite for the compiled keyword matcher"""
+    
+    def setup_method(self):
+        self.matcher = KeywordMatcher.from_knowledge(ABDOMINAL_PAIN_KNOWLEDGE)
+    
+    def test_word_boundaries(self):
+        """Test that short phrases do not fire inside longer words"""
+        assert "greetings" not in self.matcher.match("this chest feels tight")
+        assert "greetings" in self.matcher.match("Hi, my stomach hurts")
+    
+    def test_single_pass_finds_every_category(self):
+        """Test that intents, warnings and symptoms are found together"""
+        matches = self.matcher.match("Hello, I have chest pain, high fever and I'm nauseous")
+        
+        assert matches["greetings"] == ["hello"]
+        assert matches["warning"] == ["chest pain", "high fever"]
+        assert set(matches["symptom"]) == {"pain", "fever", "nausea"}
+    
+    def test_overlapping_phrases(self):
+        """Test that phrases sharing a suffix are all reported"""
+        matcher = KeywordMatcher()
+        matcher.add("blood in stool", "warning")
+        matcher.add("stool", "symptom")
+        matcher.add("in stool", "other")
+        
+        matches = matcher.match("there is blood in stool")
+        assert matches == {"warning": ["blood in stool"], "other": ["in stool"], "symptom": ["stool"]}
+    
+    def test_conditions_and_warning_alternatives(self):
+        """Test that condition names and symptoms report the condition, and 'or' warnings match each form"""
+        assert self.matcher.match("appendicitis?")["condition"] == ["appendicitis"]
+        assert self.matcher.match("blood in urine")["condition"] == ["kidney_stones"]
+        assert self.matcher.match("blood in vomit")["warning"] == ["blood in vomit or stool"]
+        assert self.matcher.match("inability to pass stool")["warning"] == ["inability to pass gas or stool"]
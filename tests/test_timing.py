@@ -0,0 +1,56 @@
+import sys
+import os
+import time
+
+# Add the app directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'app')))
+
+from utils.timing import LatencyBudget, StageTimer
+
+
+class TestLatencyBudget:
+    """Test suite for per-turn latency budgets"""
+    
+    def test_unlimited_budget(self):
+        """Test that a missing or zero budget never expires"""
+        for budget_ms in (None, 0):
+            budget = LatencyBudget(budget_ms)
+            assert budget.remaining_seconds() is None
+            assert not budget.expired
+            assert budget.report()["budget_used"] is None
+    
+    def test_budget_expires(self):
+        """Test that the remaining time counts down to zero"""
+        budget = LatencyBudget(20)
+        assert 0 < budget.remaining_seconds() <= 0.02
+        time.sleep(0.03)
+        assert budget.expired
+        assert budget.remaining_seconds() == 0.0
+        assert budget.report()["budget_used"] >= 1
+
+
+class TestStageTimer:
+    """Test suite for per-stage turn timings"""
+    
+    def test_nested_stages_are_exclusive(self):
+        """Test that an outer stage does not count time spent in nested stages"""
+        timings = StageTimer()
+        with timings.stage("retrieval"):
+            with timings.stage("embedding"):
+                time.sleep(0.02)
+        
+        assert timings.stages["embedding"] >= 0.02
+        assert timings.stages["retrieval"] < 0.01
+        assert set(timings.report()) == {"retrieval", "embedding"}
+    
+    def test_recorded_time_accumulates(self):
+        """Test that externally measured time is added to its stage alongside timed stages"""
+        timings = StageTimer()
+        timings.record("admission", 0.25)
+        timings.record("admission", 0.25)
+        with timings.stage("session"):
+            pass
+        
+        assert timings.stages["admission"] == 0.5
+        assert timings.report()["admission"] == 500.0
+        assert set(timings.report()) == {"admission", "session"}